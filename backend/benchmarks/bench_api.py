@@ -0,0 +1,112 @@
+"""End-to-end benchmarks for the /api/v1/patients* routes.
+
+The FastAPI app runs in-process behind httpx's ASGI transport. It is backed by
+mongomock-motor, or by a real server when BENCH_MONGODB_URI is set (for
+example a local mongod).
+"""
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import jwt
+
+from services.synthetic import make_patient
+from benchmarks.timing import summarize
+
+BENCH_DB_NAME = "riskscore-benchmark"
+
+
+def _database():
+    uri = os.environ.get("BENCH_MONGODB_URI")
+    if uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        return AsyncIOMotorClient(uri)[BENCH_DB_NAME], "mongod"
+    from mongomock_motor import AsyncMongoMockClient
+    return AsyncMongoMockClient()[BENCH_DB_NAME], "mongomock"
+
+
+async def _timed(client, durations, method, url, **kwargs):
+    start = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    durations.append(time.perf_counter() - start)
+    response.raise_for_status()
+    return response
+
+
+async def _run_scenario(name, client, make_request, requests, concurrency, **params):
+    durations = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            method, url, kwargs = make_request(i)
+            await _timed(client, durations, method, url, **kwargs)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    result = summarize(name, durations, concurrency=concurrency, **params)
+    result["throughput_rps"] = requests / elapsed
+    return result
+
+
+async def run_async(quick=False, concurrency=16):
+    import main
+    from db import get_database
+    from services.auth_service import JWT_SECRET
+    from services.reports import shutdown_executor
+
+    db, backend = _database()
+    await db.patients.delete_many({})
+    await db.users.delete_many({})
+    await db.users.insert_one({"name": "Bench", "email": "bench@example.com", "google_id": "bench"})
+    token = jwt.encode({"sub": "bench", "exp": datetime.utcnow() + timedelta(hours=1)}, JWT_SECRET, algorithm="HS256")
+
+    async def bench_database():
+        return db
+
+    main.app.dependency_overrides[get_database] = bench_database
+    seed_count = 200 if quick else 2000
+    requests = 200 if quick else 2000
+    rng = random.Random(7)
+    results = []
+    transport = httpx.ASGITransport(app=main.app)
+    headers = {"Authorization": f"Bearer {token}"}
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+            seed = [make_patient(rng) for _ in range(seed_count)]
+            ids = []
+
+            durations = []
+            start = time.perf_counter()
+            for patient in seed:
+                response = await _timed(client, durations, "POST", "/api/v1/patients", json=patient)
+                ids.append(response.json()["id"])
+            result = summarize("POST /patients", durations, concurrency=1, backend=backend)
+            result["throughput_rps"] = seed_count / (time.perf_counter() - start)
+            results.append(result)
+
+            scenarios = [
+                ("GET /patients", lambda i: ("GET", "/api/v1/patients", {"params": {"limit": 100, "sortBy": "name"}})),
+                ("GET /patients?search", lambda i: ("GET", "/api/v1/patients", {"params": {"search": "ali", "limit": 50}})),
+                ("GET /patients/{id}", lambda i: ("GET", f"/api/v1/patients/{ids[i % len(ids)]}", {})),
+                ("PATCH /patients/{id} notes", lambda i: ("PATCH", f"/api/v1/patients/{ids[i % len(ids)]}", {"json": {"clinicianNotes": f"note {i}"}})),
+                ("PATCH /patients/{id} history", lambda i: ("PATCH", f"/api/v1/patients/{ids[i % len(ids)]}", {"json": {"medicalHistory": seed[(i * 7) % len(seed)]["medicalHistory"]}})),
+                ("PUT /patients/{id}", lambda i: ("PUT", f"/api/v1/patients/{ids[i % len(ids)]}", {"json": seed[(i * 3) % len(seed)]})),
+                ("POST /patients/score:batch", lambda i: ("POST", "/api/v1/patients/score:batch", {"json": {"patients": seed[:100]}})),
+                ("POST /patients/{id}/generate-report", lambda i: ("POST", f"/api/v1/patients/{ids[i % 20]}/generate-report", {})),
+            ]
+            for name, make_request in scenarios:
+                count = requests // 10 if "score:batch" in name else requests
+                results.append(await _run_scenario(name, client, make_request, count, concurrency, backend=backend))
+    finally:
+        main.app.dependency_overrides.pop(get_database, None)
+        shutdown_executor()
+    return results
+
+
+def run(quick=False, concurrency=16):
+    return asyncio.run(run_async(quick, concurrency))
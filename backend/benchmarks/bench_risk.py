@@ -0,0 +1,40 @@
+"""Microbenchmarks for the risk engine."""
+import random
+
+from services.synthetic import make_patient, make_patients
+from benchmarks.timing import measure
+from services.risk_assessment import assess_risk, risk_memo
+from services.risk_batch import score_batch
+
+HISTORY_LENGTHS = [0, 5, 20, 100, 500]
+BATCH_SIZES = [100, 1000, 10000]
+
+
+def run(quick=False):
+    results = []
+    iterations = 200 if quick else 2000
+    rng = random.Random(1)
+
+    for length in HISTORY_LENGTHS:
+        patients = [make_patient(rng, history_length=length) for _ in range(50)]
+        cursor = iter(range(10 ** 9))
+
+        def score_next():
+            assess_risk(patients[next(cursor) % len(patients)])
+
+        # Cold: the memo is cleared first, so every call runs the full rules.
+        results.append(measure("assess_risk.cold", score_next, iterations, setup=risk_memo.clear, history_length=length))
+        # Warm: the same 50 inputs repeat, as common combinations do in practice.
+        results.append(measure("assess_risk.warm", score_next, iterations, history_length=length))
+
+    for size in BATCH_SIZES[:2] if quick else BATCH_SIZES:
+        patients = make_patients(size, seed=size)
+        results.append(measure("score_batch", lambda: score_batch(patients), 3 if quick else 10, batch_size=size))
+
+        def scalar_loop():
+            risk_memo.clear()
+            for patient in patients:
+                assess_risk(patient)
+
+        results.append(measure("assess_risk.loop", scalar_loop, 3 if quick else 10, batch_size=size))
+    return results
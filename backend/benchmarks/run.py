@@ -0,0 +1,93 @@
+"""Runs the benchmark suite and writes the results as JSON.
+
+From the backend directory:
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --quick --compare bench.json
+
+--compare prints the change in median latency against an earlier results
+file and exits non-zero if any benchmark slowed down by more than
+--threshold percent.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+# The app reads JWT_SECRET at import; benchmarks mint their own tokens.
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _key(result):
+    return result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def compare(results, baseline, threshold):
+    previous = {_key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get(_key(result))
+        if old is None:
+            continue
+        change = (result["median_us"] - old["median_us"]) / old["median_us"] * 100
+        marker = ""
+        if change > threshold:
+            marker = "  REGRESSION"
+            regressions.append(result)
+        print(f"{result['name']:<40} {json.dumps(result['params'], sort_keys=True):<45} {old['median_us']:>12.1f} -> {result['median_us']:>12.1f} us ({change:+.1f}%){marker}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suite", choices=["all", "risk", "api"], default="all")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations, for smoke runs")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args(argv)
+
+    results = []
+    if args.suite in ("all", "risk"):
+        from benchmarks import bench_risk
+        results += bench_risk.run(args.quick)
+    if args.suite in ("all", "api"):
+        from benchmarks import bench_api
+        results += bench_api.run(args.quick, args.concurrency)
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+import statistics
+import time
+
+
+def summarize(name, durations, **params):
+    """Latency statistics for a list of per-operation durations in seconds."""
+    ordered = sorted(durations)
+    total = sum(ordered)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    return {
+        "name": name,
+        "params": params,
+        "count": len(ordered),
+        "mean_us": total / len(ordered) * 1e6,
+        "median_us": statistics.median(ordered) * 1e6,
+        "p95_us": percentile(95) * 1e6,
+        "p99_us": percentile(99) * 1e6,
+        "ops_per_sec": len(ordered) / total if total else None,
+    }
+
+
+def measure(name, fn, iterations, setup=None, **params):
+    durations = []
+    for _ in range(iterations):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return summarize(name, durations, **params)
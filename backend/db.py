@@ -1,7 +1,10 @@
+import asyncio
 import os
+import time
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo.errors import ConnectionFailure
+from pymongo.errors import ConnectionFailure, PyMongoError
 from dotenv import load_dotenv
+from services.metrics import MongoCommandListener
 
 load_dotenv()
 
@@ -12,24 +15,79 @@ if not MONGO_URI:
     print("Warning: MONGODB_URI environment variable not set. Using a placeholder.")
     MONGO_URI = "mongodb://localhost:27017/"
 
-try:
-    client = AsyncIOMotorClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-    client.admin.command('ismaster')
-    print("Successfully connected to MongoDB.")
-except ConnectionFailure as e:
-    print(f"Could not connect to MongoDB: {e}")
-    client = None
-except Exception as e:
-    print(f"An unexpected error occurred during MongoDB connection: {e}")
+# Connection pool sizing, tunable per deployment.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 60000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+
+# How long a readiness probe result is reused before pinging again.
+HEALTH_CHECK_TTL = float(os.getenv("HEALTH_CHECK_TTL", 5))
+
+client = None
+_last_ping = None
+_ping_lock = None
+
+
+def connect():
+    """Creates the Motor client on first use.
+
+    Constructing the client does no network I/O; connections are opened by
+    the driver as operations need them, so importing this module stays cheap.
+    """
+    global client
+    if client is None:
+        client = AsyncIOMotorClient(
+            MONGO_URI,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            event_listeners=[MongoCommandListener()],
+        )
+    return client
+
+
+def close():
+    global client, _last_ping
+    if client is not None:
+        client.close()
     client = None
+    _last_ping = None
+
 
 def get_database_client():
     return client
 
-async def get_database():
+
+async def ping():
+    """Returns (ok, error) for the database, reusing recent results.
+
+    Concurrent probes share a single ping so a burst of health checks issues
+    at most one command per HEALTH_CHECK_TTL.
+    """
+    global _last_ping, _ping_lock
     if client is None:
-        # This will be caught by FastAPI's dependency injection system
-        # and result in a 500 error. A more robust solution might
-        # involve a startup hook to ensure the DB is connected.
-        raise ConnectionFailure("Database connection is not available.")
-    return client[DB_NAME]
\ No newline at end of file
+        return False, "Database connection not configured"
+    if _last_ping is not None and time.monotonic() - _last_ping[0] < HEALTH_CHECK_TTL:
+        return _last_ping[1]
+    if _ping_lock is None:
+        _ping_lock = asyncio.Lock()
+    async with _ping_lock:
+        if _last_ping is not None and time.monotonic() - _last_ping[0] < HEALTH_CHECK_TTL:
+            return _last_ping[1]
+        try:
+            await client.admin.command('ping')
+            result = (True, None)
+        except PyMongoError as e:
+            result = (False, str(e))
+        _last_ping = (time.monotonic(), result)
+        return result
+
+
+async def get_database():
+    try:
+        return connect()[DB_NAME]
+    except PyMongoError as e:
+        # Bad URIs and similar configuration errors surface here.
+        raise ConnectionFailure(f"Database connection is not available: {e}")
@@ -1,14 +1,58 @@
 import os
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pymongo.errors import ConnectionFailure
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from dotenv import load_dotenv
 
-from db import get_database_client
+import db
+from services.indexes import ensure_indexes
+from services.http_client import create_http_client
+from services.reports import report_cache, shutdown_executor
+from services.metrics import MetricsMiddleware, cache_stats
+from services.auth_service import principal_cache
+from services.risk_assessment import risk_memo
+from services.audit import audit_trail
+from services.stats import stats_rollup
+from services.patient_cache import patient_cache
 
 load_dotenv()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # MongoDB connection; the driver connects lazily, so startup does not wait
+    # on the network. Index creation also runs in the background.
+    client = db.connect()
+    index_task = asyncio.create_task(ensure_indexes(client[db.DB_NAME]))
+    # Audit entries and dashboard rollup deltas are written behind the
+    # request and drained on shutdown.
+    audit_trail.start()
+    stats_rollup.start(client[db.DB_NAME])
+    # Evicts cached patients as they change in any worker; falls back to a
+    # short TTL when change streams are unavailable.
+    patient_cache.start(client[db.DB_NAME])
+    # One pooled client for outbound calls (Google OAuth); tests may install
+    # their own on app.state before startup.
+    owns_http_client = getattr(app.state, "http_client", None) is None
+    if owns_http_client:
+        app.state.http_client = create_http_client()
+    yield
+    await audit_trail.stop()
+    await stats_rollup.stop()
+    await patient_cache.stop()
+    if owns_http_client:
+        await app.state.http_client.aclose()
+        app.state.http_client = None
+    shutdown_executor()
+    if not index_task.done():
+        index_task.cancel()
+    db.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS configuration
 origins = [
@@ -21,28 +65,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+app.add_middleware(MetricsMiddleware)
 
-# MongoDB connection
-client = get_database_client()
+cache_stats.register("principal", principal_cache)
+cache_stats.register("report", report_cache)
+cache_stats.register("risk_memo", risk_memo)
+cache_stats.register("patient", patient_cache)
 
 
 @app.get("/api/v1/healthz")
-def health_check():
-    if client is None:
-        raise HTTPException(status_code=503, detail="Database connection not configured")
-    try:
-        # The ismaster command is cheap and does not require auth.
-        client.admin.command('ismaster')
-        return {"status": "ok", "database": "connected"}
-    except ConnectionFailure as e:
-        raise HTTPException(status_code=503, detail=f"Database connection failed: {e}")
-
-from routes import auth, patients, truform
+async def health_check():
+    ok, error = await db.ping()
+    if not ok:
+        raise HTTPException(status_code=503, detail=f"Database connection failed: {error}")
+    return {"status": "ok", "database": "connected"}
+
+@app.get("/api/v1/metrics")
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+from routes import admin, auth, cohort, patients, stats, truform
 
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(patients.router, prefix="/api/v1")
 app.include_router(truform.router, prefix="/api/v1")
+app.include_router(admin.router, prefix="/api/v1")
+app.include_router(stats.router, prefix="/api/v1")
+app.include_router(cohort.router, prefix="/api/v1")
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,33 @@
+from typing import Dict, Optional
+from pydantic import BaseModel
+
+class WhatIfRequest(BaseModel):
+    # Proposed rule cutoffs; anything left out keeps its current value.
+    ageThreshold: Optional[int] = None
+    osaStopBang: Optional[int] = None
+    airwayMallampati: Optional[int] = None
+    highAsa: Optional[int] = None
+    highStopBang: Optional[int] = None
+    highRcri: Optional[int] = None
+    highMets: Optional[int] = None
+    moderateAsa: Optional[int] = None
+    moderateStopBang: Optional[int] = None
+    moderateRcri: Optional[int] = None
+    moderateMets: Optional[int] = None
+
+class WhatIfResponse(BaseModel):
+    patients: int
+    changed: int
+    current: Dict[str, int]
+    proposed: Dict[str, int]
+    # transitions[current][proposed] = number of patients
+    transitions: Dict[str, Dict[str, int]]
+    thresholds: Dict[str, int]
+    elapsedMs: float
+
+class CohortStatus(BaseModel):
+    patients: int
+    rows: int
+    bytes: int
+    loadedSecondsAgo: Optional[float] = None
+    refreshedSecondsAgo: Optional[float] = None
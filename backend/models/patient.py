@@ -1,5 +1,5 @@
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
 from bson import ObjectId
 
@@ -22,9 +22,19 @@ class Patient(BaseModel):
     criticalAlerts: Optional[List[str]] = []
     preOpRecommendations: Optional[List[str]] = []
     completedRecommendations: Optional[List[str]] = []
+    riskRulesVersion: Optional[int] = None
+    riskFingerprint: Optional[str] = None
+    riskReviewDate: Optional[str] = None
+    riskSeverity: Optional[int] = None
     lastModified: Optional[datetime] = None
     modifiedBy: Optional[str] = None
 
+    @field_validator("medicalHistory", "medications", "allergies", "surgicalHistory", "completedRecommendations")
+    @classmethod
+    def empty_if_null(cls, value):
+        # Scoring iterates these; a full document treats null as empty.
+        return [] if value is None else value
+
     class Config:
         collection = "patients"
         populate_by_name = True
@@ -35,3 +45,70 @@ class Patient(BaseModel):
 
 class PatientOut(Patient):
     id: str
+
+class PatientSummary(BaseModel):
+    # List-page view: no notes, airway findings or histories.
+    id: str
+    name: str
+    dateOfBirth: str
+    asaScore: Optional[int] = None
+    stopBangScore: Optional[int] = None
+    rcriScore: Optional[int] = None
+    metsScore: Optional[int] = None
+    riskCategory: Optional[str] = None
+    criticalAlerts: Optional[List[str]] = []
+    lastModified: Optional[datetime] = None
+    modifiedBy: Optional[str] = None
+
+class PatientUpdate(BaseModel):
+    # Fields a client may change; scores are always derived server-side.
+    name: Optional[str] = None
+    dateOfBirth: Optional[str] = None
+    medicalHistory: Optional[List[str]] = None
+    medications: Optional[List[str]] = None
+    allergies: Optional[List[str]] = None
+    surgicalHistory: Optional[List[str]] = None
+    mallampatiScore: Optional[int] = None
+    airwayExamFindings: Optional[str] = None
+    clinicianNotes: Optional[str] = None
+    completedRecommendations: Optional[List[str]] = None
+
+    @field_validator("name", "dateOfBirth", "medicalHistory", "medications", "allergies", "surgicalHistory", "completedRecommendations")
+    @classmethod
+    def not_null(cls, value):
+        # Omit a field to leave it unchanged; null would be stored as-is and
+        # break scoring.
+        if value is None:
+            raise ValueError("may be omitted but not null")
+        return value
+
+class RiskAssessment(BaseModel):
+    asaScore: Optional[int] = None
+    stopBangScore: Optional[int] = None
+    rcriScore: Optional[int] = None
+    metsScore: Optional[int] = None
+    riskCategory: Optional[str] = None
+    criticalAlerts: List[str] = []
+    preOpRecommendations: List[str] = []
+
+class BatchScoreRequest(BaseModel):
+    patients: List[Patient]
+
+class BatchScoreResponse(BaseModel):
+    results: List[RiskAssessment]
+
+class ReportBatchRequest(BaseModel):
+    patientIds: List[str]
+
+
+class FieldChange(BaseModel):
+    before: Any = None
+    after: Any = None
+
+class PatientAuditEntry(BaseModel):
+    id: str
+    patientId: str
+    action: str
+    changes: Dict[str, FieldChange] = {}
+    actor: Optional[str] = None
+    at: datetime
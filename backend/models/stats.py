@@ -0,0 +1,16 @@
+from typing import Dict, Optional
+from pydantic import BaseModel
+from datetime import datetime
+
+class RecommendationCounts(BaseModel):
+    outstanding: int = 0
+    completed: int = 0
+
+class PatientStats(BaseModel):
+    total: int = 0
+    riskCategory: Dict[str, int] = {}
+    asaScore: Dict[str, int] = {}
+    criticalAlerts: Dict[str, int] = {}
+    recommendations: Dict[str, RecommendationCounts] = {}
+    updatedAt: Optional[datetime] = None
+    reconciledAt: Optional[datetime] = None
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, Query
+from db import get_database
+from services.auth_service import get_current_user
+from services.rescore import DEFAULT_CHUNK_SIZE, rescore_patients, stale_patients_query
+from services.stats import stats_rollup
+from models.user import User
+
+router = APIRouter()
+
+@router.post("/admin/rescore", status_code=202)
+async def rescore(background_tasks: BackgroundTasks, chunk_size: int = Query(DEFAULT_CHUNK_SIZE, ge=1), staleOnly: bool = False, db=Depends(get_database), current_user: User = Depends(get_current_user)):
+    query = stale_patients_query() if staleOnly else None
+    background_tasks.add_task(rescore_patients, db, chunk_size, query)
+    background_tasks.add_task(stats_rollup.reconcile, db)
+    return {"message": "Rescoring started"}
+
+@router.post("/admin/stats:reconcile")
+async def reconcile_stats(db=Depends(get_database), current_user: User = Depends(get_current_user)):
+    await stats_rollup.reconcile(db)
+    return await stats_rollup.read(db)
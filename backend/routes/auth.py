@@ -8,10 +8,15 @@ from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorClient
 from models.user import User
 from db import get_database
-from services.auth_service import get_current_user
+from services.auth_service import JWT_SECRET, get_current_user, principal_cache, update_user
+from services.http_client import get_http_client, request_with_retry
 
 router = APIRouter()
 
+# Overridable so a local stand-in can replace Google's endpoints.
+GOOGLE_TOKEN_URL = os.environ.get("GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token")
+GOOGLE_USERINFO_URL = os.environ.get("GOOGLE_USERINFO_URL", "https://www.googleapis.com/oauth2/v1/userinfo")
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 class Token(BaseModel):
@@ -22,12 +27,10 @@ class GoogleAuthCode(BaseModel):
     code: str
 
 @router.post("/auth/google", response_model=Token)
-async def auth_google(auth_code: GoogleAuthCode, db = Depends(get_database)):
+async def auth_google(auth_code: GoogleAuthCode, db = Depends(get_database), http_client: httpx.AsyncClient = Depends(get_http_client)):
     GOOGLE_CLIENT_ID = os.environ.get("GOOGLE_CLIENT_ID")
     GOOGLE_CLIENT_SECRET = os.environ.get("GOOGLE_CLIENT_SECRET")
-    JWT_SECRET = os.environ.get("JWT_SECRET")
     
-    token_url = "https://oauth2.googleapis.com/token"
     redirect_uri = "https://riskscore-jjvw.onrender.com/auth/callback"
         
     data = {
@@ -38,8 +41,7 @@ async def auth_google(auth_code: GoogleAuthCode, db = Depends(get_database)):
         "grant_type": "authorization_code"
     }
     
-    async with httpx.AsyncClient() as http_client:
-        token_response = await http_client.post(token_url, data=data)
+    token_response = await request_with_retry(http_client, "POST", GOOGLE_TOKEN_URL, idempotent=False, data=data)
     
     token_json = token_response.json()
     
@@ -48,11 +50,9 @@ async def auth_google(auth_code: GoogleAuthCode, db = Depends(get_database)):
         
     access_token = token_json["access_token"]
     
-    user_info_url = "https://www.googleapis.com/oauth2/v1/userinfo"
     headers = {"Authorization": f"Bearer {access_token}"}
     
-    async with httpx.AsyncClient() as http_client:
-        user_response = await http_client.get(user_info_url, headers=headers)
+    user_response = await request_with_retry(http_client, "GET", GOOGLE_USERINFO_URL, headers=headers)
     
     user_info = user_response.json()
     
@@ -69,6 +69,14 @@ async def auth_google(auth_code: GoogleAuthCode, db = Depends(get_database)):
         )
         result = await db.users.insert_one(new_user.model_dump(exclude={"id"}, by_alias=True))
         user = await db.users.find_one({"_id": result.inserted_id})
+    elif user.get("name") != user_info["name"]:
+        # Keep the display name in step with the Google profile.
+        await update_user(db, user_info["id"], {"name": user_info["name"]})
+
+    # Logging in reloads the cached principal on this worker, so edits made
+    # to the user document elsewhere show up at the latest on the next login;
+    # other workers pick them up within PRINCIPAL_CACHE_TTL.
+    principal_cache.invalidate(user_info["id"])
     
     jwt_payload = {
         "sub": user_info["id"],
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends
+from db import get_database
+from models.cohort import CohortStatus, WhatIfRequest, WhatIfResponse
+from services.auth_service import get_current_user
+from services.cohort import cohort_snapshot, thresholds_from
+from models.user import User
+
+router = APIRouter()
+
+@router.get("/cohort/snapshot", response_model=CohortStatus)
+async def get_snapshot(db=Depends(get_database), current_user: User = Depends(get_current_user)):
+    await cohort_snapshot.ensure_fresh(db)
+    return cohort_snapshot.status()
+
+@router.post("/cohort/what-if", response_model=WhatIfResponse)
+async def what_if(request: WhatIfRequest, db=Depends(get_database), current_user: User = Depends(get_current_user)):
+    await cohort_snapshot.ensure_fresh(db)
+    return cohort_snapshot.evaluate(thresholds_from(request.model_dump()))
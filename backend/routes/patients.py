@@ -1,114 +1,324 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
-from models.patient import Patient, PatientOut
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from typing import List, Optional, Union
+from models.patient import Patient, PatientAuditEntry, PatientOut, PatientSummary, PatientUpdate, BatchScoreRequest, BatchScoreResponse, ReportBatchRequest
 from db import get_database
 from services.auth_service import get_current_user
 from models.user import User
-from datetime import datetime
+from datetime import date, datetime
 from bson import ObjectId
-from services.risk_assessment import assess_risk
-from fpdf import FPDF
+from pymongo import ReturnDocument, UpdateOne
+from services.risk_assessment import RISK_METADATA_FIELDS, RULES_VERSION, SCORE_INPUT_FIELDS, score_changes, score_patient, scores_are_stale
+from services.risk_batch import score_batch
+from services.pagination import build_list_query, encode_cursor, keyset_filter
+from services.audit import audit_entry, audit_trail
+from services.stats import stats_rollup
+from services.patient_cache import patient_cache
+from services.export import EXTENSIONS, FORMATS, PYARROW_AVAILABLE, export_query, stream_export
+from services.http_cache import bump_collection_version, collection_version, is_not_modified, list_etag, not_modified, patient_validators, validators
+from services.reports import get_report, stream_reports_zip
+from services.rescore import scored_version_filter
+from services.serialization import DocumentView, ORJSONResponse, dumps
 from fastapi.responses import StreamingResponse
-import io
+from starlette.concurrency import run_in_threadpool
 
 router = APIRouter()
 
-@router.get("/patients", response_model=List[PatientOut])
-async def get_patients(db=Depends(get_database), current_user: User = Depends(get_current_user)):
-    patients = await db.patients.find().to_list(100)
-    return [PatientOut(**p, id=str(p["_id"])) for p in patients]
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+# Rescoring PATCHes retry this many times when another write lands between
+# the read and the write.
+PATCH_ATTEMPTS = 3
+
+HISTORY_FIELDS = ["medicalHistory", "medications", "allergies", "surgicalHistory"]
+
+PATIENT_VIEWS = {
+    "full": DocumentView(PatientOut),
+    "summary": DocumentView(PatientSummary),
+}
+FULL_VIEW = PATIENT_VIEWS["full"]
+AUDIT_VIEW = DocumentView(PatientAuditEntry)
+# Summary reads also need the scoring metadata to detect stale scores.
+SUMMARY_PROJECTION = {**PATIENT_VIEWS["summary"].projection, **{field: 1 for field in RISK_METADATA_FIELDS}}
+
+def normalize_history_fields(patient_data):
+    for field in HISTORY_FIELDS:
+        if isinstance(patient_data.get(field), str):
+            patient_data[field] = [item.strip() for item in patient_data[field].split(',') if item.strip()]
+    return patient_data
+
+def modification_time():
+    # MongoDB keeps millisecond precision; truncating here means the value we
+    # return without re-reading matches what was stored.
+    now = datetime.now()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+async def record_change(db, action, before, after, actor, at):
+    # The audit entry and rollup delta are written behind the request; only
+    # the list version bump is a round-trip.
+    patient_id = (before or after)["_id"]
+    # Other workers evict through the change stream; this one need not wait.
+    patient_cache.evict(patient_id)
+    await bump_collection_version(db, "patients")
+    await audit_trail.record(db, audit_entry(action, patient_id, before, after, actor, at))
+    await stats_rollup.record(db, before, after)
+
+async def refresh_stale_scores(db, patients, projected=False):
+    # Scores computed under older rules, or before the patient's age band
+    # changed, are recomputed on read and written back without touching
+    # lastModified. Projected documents lack the score inputs, so stale ones
+    # are re-read in full first.
+    stale = [patient for patient in patients if scores_are_stale(patient)]
+    if not stale:
+        return patients
+    sources = {}
+    if projected:
+        async for document in db.patients.find({"_id": {"$in": [patient["_id"] for patient in stale]}}):
+            sources[document["_id"]] = document
+    operations = []
+    deltas = []
+    for patient in stale:
+        source = sources.get(patient["_id"], patient)
+        changes = score_changes(source, score_patient(source))
+        if changes:
+            # Only written over the version that was scored, so a read served
+            # from an outdated copy cannot overwrite a newer write's scores.
+            operations.append(UpdateOne(scored_version_filter(source), {"$set": changes}))
+            deltas.append((dict(source), {**source, **changes}))
+            patient_cache.evict(patient["_id"])
+            patient.update(changes)
+    if operations:
+        result = await db.patients.bulk_write(operations, ordered=False)
+        await bump_collection_version(db, "patients")
+        # Where a guard missed, the newer write recorded its own delta. Which
+        # updates matched is not reported, so the periodic reconcile settles
+        # the counts for a partially applied batch.
+        if result.matched_count == len(operations):
+            for before, after in deltas:
+                await stats_rollup.record(db, before, after)
+    return patients
+
+@router.get("/patients", response_model=Union[List[PatientOut], List[PatientSummary]])
+async def get_patients(
+    request: Request,
+    search: Optional[str] = None,
+    sortBy: str = "name",
+    sortDir: str = "asc",
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    view: str = Query("full", pattern="^(full|summary)$"),
+    db=Depends(get_database),
+    current_user: User = Depends(get_current_user),
+):
+    query, sort, collation = build_list_query(search, sortBy, sortDir, cursor)
+    renderer = PATIENT_VIEWS[view]
+    projected = view == "summary"
+    projection = SUMMARY_PROJECTION if projected else None
+    ndjson = "application/x-ndjson" in request.headers.get("accept", "")
+
+    # Any patient write bumps the collection version, so an unchanged version
+    # means an unchanged page and polling clients get a 304 without the list
+    # query. The date is included because scores can go stale with age.
+    version = await collection_version(db, "patients")
+    etag = list_etag(version, RULES_VERSION, date.today(), ndjson, view, search, sortBy, sortDir, cursor, limit)
+    headers = validators(etag)
+    if is_not_modified(request, etag):
+        return not_modified(headers)
+
+    if ndjson:
+        # Streams every matching patient (or ``limit`` of them) as the cursor
+        # yields batches, without buffering the result set.
+        patients = db.patients.find(query, projection, sort=sort, collation=collation, limit=limit or 0, batch_size=STREAM_BATCH_SIZE)
+
+        async def stream():
+            # Stale scores are refreshed a batch at a time, with one bulk
+            # write and version bump per batch.
+            batch = []
+            async for p in patients:
+                batch.append(p)
+                if len(batch) >= STREAM_BATCH_SIZE:
+                    await refresh_stale_scores(db, batch, projected)
+                    yield b"".join(dumps(renderer.render(p)) + b"\n" for p in batch)
+                    batch = []
+            if batch:
+                await refresh_stale_scores(db, batch, projected)
+                yield b"".join(dumps(renderer.render(p)) + b"\n" for p in batch)
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson", headers=headers)
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    # One extra document tells us whether another page exists.
+    patients = await db.patients.find(query, projection, sort=sort, collation=collation, limit=limit + 1).to_list(limit + 1)
+    if len(patients) > limit:
+        patients = patients[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(patients[-1], sort[0][0])
+    await refresh_stale_scores(db, patients, projected)
+    return ORJSONResponse(renderer.render_many(patients), headers=headers)
 
 @router.post("/patients", response_model=PatientOut)
 async def create_patient(patient: Patient, db=Depends(get_database), current_user: User = Depends(get_current_user)):
     patient_data = patient.model_dump(exclude={"id"}, by_alias=True)
  
-    history_fields = ["medicalHistory", "medications", "allergies", "surgicalHistory"]
-    for field in history_fields:
-        if isinstance(patient_data.get(field), str):
-            patient_data[field] = [item.strip() for item in patient_data[field].split(',') if item.strip()]
-    risk_assessment = assess_risk(patient_data)
+    normalize_history_fields(patient_data)
+    risk_assessment = score_patient(patient_data)
     patient_data.update(risk_assessment)
     
     patient_data['modifiedBy'] = current_user['google_id']
-    patient_data['lastModified'] = datetime.now()
+    patient_data['lastModified'] = modification_time()
     
-    new_patient = await db.patients.insert_one(patient_data)
-    created_patient = await db.patients.find_one({"_id": new_patient.inserted_id})
-    return PatientOut(**created_patient, id=str(created_patient["_id"]))
+    await db.patients.insert_one(patient_data)
+    await record_change(db, "create", None, patient_data, patient_data['modifiedBy'], patient_data['lastModified'])
+    return FULL_VIEW.response(patient_data)
+
+@router.post("/patients/score:batch", response_model=BatchScoreResponse)
+async def score_patients(request: BatchScoreRequest, current_user: User = Depends(get_current_user)):
+    patients = [normalize_history_fields(p.model_dump(exclude={"id"}, by_alias=True)) for p in request.patients]
+    return {"results": await run_in_threadpool(score_batch, patients)}
+
+@router.get("/patients/export")
+async def export_patients(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|parquet|arrow)$"),
+    riskCategory: Optional[List[str]] = Query(None),
+    modifiedFrom: Optional[datetime] = None,
+    modifiedTo: Optional[datetime] = None,
+    after: Optional[str] = None,
+    db=Depends(get_database),
+    current_user: User = Depends(get_current_user),
+):
+    # Rows come out in _id order; an interrupted download resumes by passing
+    # the last id received as ``after``.
+    if fmt != "csv" and not PYARROW_AVAILABLE:
+        raise HTTPException(status_code=400, detail=f"The {fmt} format is not available on this server")
+    if after and not ObjectId.is_valid(after):
+        raise HTTPException(status_code=400, detail="Invalid after id")
+    query = export_query(riskCategory, modifiedFrom, modifiedTo, after)
+    return StreamingResponse(stream_export(db, query, fmt), media_type=FORMATS[fmt], headers={"Content-Disposition": f"attachment; filename=patients.{EXTENSIONS[fmt]}"})
 
 @router.get("/patients/{patient_id}", response_model=PatientOut)
-async def get_patient(patient_id: str, db=Depends(get_database), current_user: User = Depends(get_current_user)):
-    patient = await db.patients.find_one({"_id": ObjectId(patient_id)})
+async def get_patient(patient_id: str, request: Request, db=Depends(get_database), current_user: User = Depends(get_current_user)):
+    patient = await patient_cache.find_one(db, ObjectId(patient_id))
     if patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
-    return PatientOut(**patient, id=str(patient["_id"]))
+    await refresh_stale_scores(db, [patient])
+    headers = patient_validators(patient)
+    if is_not_modified(request, headers["ETag"], patient.get("lastModified")):
+        return not_modified(headers)
+    return FULL_VIEW.response(patient, headers=headers)
 
 @router.put("/patients/{patient_id}", response_model=PatientOut)
 async def update_patient(patient_id: str, patient: Patient, db=Depends(get_database), current_user: User = Depends(get_current_user)):
     patient_data = patient.model_dump(by_alias=True, exclude={"id"})
 
-    history_fields = ["medicalHistory", "medications", "allergies", "surgicalHistory"]
-    for field in history_fields:
-        if isinstance(patient_data.get(field), str):
-            patient_data[field] = [item.strip() for item in patient_data[field].split(',') if item.strip()]
-    risk_assessment = assess_risk(patient_data)
+    normalize_history_fields(patient_data)
+    risk_assessment = score_patient(patient_data)
     patient_data.update(risk_assessment)
 
     patient_data['modifiedBy'] = current_user['google_id']
-    patient_data['lastModified'] = datetime.now()
+    patient_data['lastModified'] = modification_time()
 
-    await db.patients.update_one({"_id": ObjectId(patient_id)}, {"$set": patient_data})
-    updated_patient = await db.patients.find_one({"_id": ObjectId(patient_id)})
-    if updated_patient is None:
+    previous = await db.patients.find_one_and_update({"_id": ObjectId(patient_id)}, {"$set": patient_data}, return_document=ReturnDocument.BEFORE)
+    if previous is None:
         raise HTTPException(status_code=404, detail="Patient not found")
-    return PatientOut(**updated_patient, id=str(updated_patient["_id"]))
+    updated_patient = {**previous, **patient_data}
+    await record_change(db, "update", previous, updated_patient, patient_data['modifiedBy'], patient_data['lastModified'])
+    return FULL_VIEW.response(updated_patient)
+
+@router.patch("/patients/{patient_id}", response_model=PatientOut)
+async def patch_patient(patient_id: str, changes: PatientUpdate, db=Depends(get_database), current_user: User = Depends(get_current_user)):
+    if not ObjectId.is_valid(patient_id):
+        raise HTTPException(status_code=404, detail="Patient not found")
+    patient_data = normalize_history_fields(changes.model_dump(exclude_unset=True))
+    patient_data['modifiedBy'] = current_user['google_id']
+    patient_data['lastModified'] = modification_time()
+
+    if not any(field in patient_data for field in SCORE_INPUT_FIELDS):
+        # Notes, checklist ticks and the like: one round-trip, no rescoring.
+        previous = await db.patients.find_one_and_update({"_id": ObjectId(patient_id)}, {"$set": patient_data}, return_document=ReturnDocument.BEFORE)
+        if previous is None:
+            raise HTTPException(status_code=404, detail="Patient not found")
+        updated_patient = {**previous, **patient_data}
+        await record_change(db, "update", previous, updated_patient, patient_data['modifiedBy'], patient_data['lastModified'])
+        await refresh_stale_scores(db, [updated_patient])
+        return FULL_VIEW.response(updated_patient)
+
+    # Score inputs are changing: rescore the merged document and write the
+    # inputs and scores in one update, applied only if the document is still
+    # the one that was scored.
+    for _ in range(PATCH_ATTEMPTS):
+        previous = await db.patients.find_one({"_id": ObjectId(patient_id)})
+        if previous is None:
+            raise HTTPException(status_code=404, detail="Patient not found")
+        updated_patient = {**previous, **patient_data}
+        changed_scores = {}
+        if scores_are_stale(previous) or any(previous.get(field) != updated_patient.get(field) for field in SCORE_INPUT_FIELDS):
+            changed_scores = score_changes(previous, score_patient(updated_patient))
+        guard = {"_id": previous["_id"], "lastModified": previous.get("lastModified"), "riskFingerprint": previous.get("riskFingerprint")}
+        result = await db.patients.update_one(guard, {"$set": {**patient_data, **changed_scores}})
+        if result.matched_count:
+            updated_patient.update(changed_scores)
+            await record_change(db, "update", previous, updated_patient, patient_data['modifiedBy'], patient_data['lastModified'])
+            return FULL_VIEW.response(updated_patient)
+    raise HTTPException(status_code=409, detail="Patient was modified concurrently, please retry")
 
 @router.delete("/patients/{patient_id}")
 async def delete_patient(patient_id: str, db=Depends(get_database), current_user: User = Depends(get_current_user)):
-    delete_result = await db.patients.delete_one({"_id": ObjectId(patient_id)})
-    if delete_result.deleted_count == 0:
+    deleted = await db.patients.find_one_and_delete({"_id": ObjectId(patient_id)})
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Patient not found")
+    await record_change(db, "delete", deleted, None, current_user['google_id'], modification_time())
     return {"message": "Patient deleted successfully"}
 
+@router.get("/patients/{patient_id}/audit", response_model=List[PatientAuditEntry])
+async def get_patient_audit(
+    patient_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db=Depends(get_database),
+    current_user: User = Depends(get_current_user),
+):
+    # Newest first. Entries outlive the patient, so a deleted patient's
+    # history is still readable.
+    if not ObjectId.is_valid(patient_id):
+        raise HTTPException(status_code=404, detail="Patient not found")
+    query = {"patientId": ObjectId(patient_id)}
+    if cursor:
+        query = {"$and": [query, keyset_filter("at", -1, cursor)]}
+    entries = await db.patient_audit.find(query, sort=[("at", -1), ("_id", -1)], limit=limit + 1).to_list(limit + 1)
+    headers = {}
+    if len(entries) > limit:
+        entries = entries[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(entries[-1], "at")
+    return ORJSONResponse(AUDIT_VIEW.render_many(entries), headers=headers)
+
+@router.post("/patients/reports:zip")
+async def generate_reports_zip(request: ReportBatchRequest, db=Depends(get_database), current_user: User = Depends(get_current_user)):
+    invalid = [patient_id for patient_id in request.patientIds if not ObjectId.is_valid(patient_id)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid patient ids: {', '.join(invalid)}")
+    ids = [ObjectId(patient_id) for patient_id in request.patientIds]
+
+    async def patients():
+        async for patient in db.patients.find({"_id": {"$in": ids}}):
+            await refresh_stale_scores(db, [patient])
+            yield patient
+
+    return StreamingResponse(stream_reports_zip(patients()), media_type="application/zip", headers={"Content-Disposition": "attachment; filename=patient_risk_profiles.zip"})
+
+@router.get("/patients/{patient_id}/report")
 @router.post("/patients/{patient_id}/generate-report")
-async def generate_report(patient_id: str, db=Depends(get_database), current_user: User = Depends(get_current_user)):
+async def generate_report(patient_id: str, request: Request, db=Depends(get_database), current_user: User = Depends(get_current_user)):
     if not ObjectId.is_valid(patient_id):
         raise HTTPException(status_code=404, detail="Patient not found")
-    patient = await db.patients.find_one({"_id": ObjectId(patient_id)})
-    patient["id"] = str(patient["_id"])
-    patient["_id"] = str(patient["_id"])
+    patient = await patient_cache.find_one(db, ObjectId(patient_id))
     if patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
+    await refresh_stale_scores(db, [patient])
+    # Checked before rendering; the GET route lets browsers revalidate on
+    # their own, the POST route honours validators a client sends.
+    headers = patient_validators(patient)
+    if is_not_modified(request, headers["ETag"], patient.get("lastModified")):
+        return not_modified(headers)
 
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    
-    pdf.cell(200, 10, txt="Patient Risk Profile", ln=True, align='C')
-    
-    # Add patient details
-    pdf.cell(200, 10, txt=f"Name: {patient.get('name', 'N/A')}", ln=True)
-    pdf.cell(200, 10, txt=f"Date of Birth: {patient.get('dateOfBirth', 'N/A')}", ln=True)
-    
-    # Add risk scores
-    pdf.cell(200, 10, txt=f"ASA Score: {patient.get('asaScore', 'N/A')}", ln=True)
-    pdf.cell(200, 10, txt=f"STOP-Bang Score: {patient.get('stopBangScore', 'N/A')}", ln=True)
-    pdf.cell(200, 10, txt=f"RCRI Score: {patient.get('rcriScore', 'N/A')}", ln=True)
-    pdf.cell(200, 10, txt=f"METs Score: {patient.get('metsScore', 'N/A')}", ln=True)
-    
-    # Add risk category
-    pdf.cell(200, 10, txt=f"Risk Category: {patient.get('riskCategory', 'N/A')}", ln=True)
-    
-    # Add critical alerts
-    pdf.cell(200, 10, txt="Critical Alerts:", ln=True)
-    for alert in patient.get('criticalAlerts', []):
-        pdf.cell(200, 10, txt=f"- {alert}", ln=True)
-        
-    # Add recommendations
-    pdf.cell(200, 10, txt="Pre-Op Recommendations:", ln=True)
-    for recommendation in patient.get('preOpRecommendations', []):
-        pdf.cell(200, 10, txt=f"- {recommendation}", ln=True)
-
-    pdf_output = pdf.output(dest='S')
-    
-    return StreamingResponse(io.BytesIO(pdf_output), media_type="application/pdf", headers={"Content-Disposition": f"attachment; filename=patient_{patient_id}_risk_profile.pdf"})
\ No newline at end of file
+    pdf_output = await get_report(patient)
+    headers["Content-Disposition"] = f"attachment; filename=patient_{patient_id}_risk_profile.pdf"
+    return Response(pdf_output, media_type="application/pdf", headers=headers)
@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Depends
+from db import get_database
+from models.stats import PatientStats
+from services.auth_service import get_current_user
+from services.stats import stats_rollup
+from models.user import User
+
+router = APIRouter()
+
+@router.get("/stats", response_model=PatientStats)
+async def get_stats(db=Depends(get_database), current_user: User = Depends(get_current_user)):
+    return await stats_rollup.read(db)
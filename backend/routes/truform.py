@@ -1,5 +1,17 @@
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Query, Request
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
+import asyncio
+import os
+import random
+from db import get_database
+from models.user import User
+from services.auth_service import get_current_user
+from services.http_client import get_http_client
+from services.synthetic import make_patient
+from services.truform_ingest import HttpTruformSource, ingest_truform_records
+from services.stats import stats_rollup
+from routes.patients import modification_time
 
 router = APIRouter()
 
@@ -18,9 +30,102 @@ mock_truform_data: Dict[str, Dict[str, Any]] = {
     }
 }
 
+# When set, ingestion pulls from a real Truform API instead of the stand-in.
+TRUFORM_BASE_URL = os.environ.get("TRUFORM_BASE_URL")
+
+MAX_STAND_IN_RECORDS = 100000
+MAX_STAND_IN_DELAY_MS = 10000
+
+
+class StandInConfig(BaseModel):
+    # Synthetic records served as TF000000, TF000001, ... alongside the fixed
+    # mock above; each is derived from (seed, index), so it never changes.
+    # The id list is built in full on every listing, hence the bounds.
+    records: int = Field(int(os.environ.get("TRUFORM_MOCK_RECORDS", 1000)), ge=0, le=MAX_STAND_IN_RECORDS)
+    seed: int = int(os.environ.get("TRUFORM_MOCK_SEED", 0))
+    latencyMs: float = Field(float(os.environ.get("TRUFORM_MOCK_LATENCY_MS", 0)), ge=0, le=MAX_STAND_IN_DELAY_MS)
+    jitterMs: float = Field(float(os.environ.get("TRUFORM_MOCK_JITTER_MS", 0)), ge=0, le=MAX_STAND_IN_DELAY_MS)
+
+
+stand_in = StandInConfig()
+
+
+def synthetic_id(index):
+    return f"TF{index:06d}"
+
+
+def stand_in_ids():
+    return list(mock_truform_data) + [synthetic_id(i) for i in range(stand_in.records)]
+
+
+def stand_in_record(id):
+    if id in mock_truform_data:
+        return mock_truform_data[id]
+    if not (id.startswith("TF") and id[2:].isdigit()) or int(id[2:]) >= stand_in.records:
+        return None
+    record = make_patient(random.Random(f"{stand_in.seed}:{id}"))
+    record["id"] = id
+    return record
+
+
+async def simulate_latency():
+    delay = stand_in.latencyMs + random.uniform(0, stand_in.jitterMs)
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+
+
+class StandInSource:
+    """Reads the stand-in directly, with its simulated latency."""
+
+    async def fetch(self, truform_id):
+        await simulate_latency()
+        return stand_in_record(truform_id)
+
+    async def list_ids(self):
+        return stand_in_ids()
+
+
+class IngestRequest(BaseModel):
+    ids: Optional[List[str]] = None
+    all: bool = False
+
+
+@router.get("/truform")
+async def list_truform_ids(offset: int = Query(0, ge=0), limit: int = Query(1000, ge=1, le=10000), current_user: User = Depends(get_current_user)):
+    ids = stand_in_ids()
+    return {"ids": ids[offset:offset + limit], "total": len(ids)}
+
+@router.get("/truform/config", response_model=StandInConfig)
+async def get_stand_in_config(current_user: User = Depends(get_current_user)):
+    return stand_in
+
+@router.put("/truform/config", response_model=StandInConfig)
+async def update_stand_in_config(config: StandInConfig, current_user: User = Depends(get_current_user)):
+    global stand_in
+    stand_in = config
+    return stand_in
+
+@router.post("/truform/ingest")
+async def ingest_truform(request: IngestRequest, http_request: Request, background_tasks: BackgroundTasks, db=Depends(get_database), current_user: User = Depends(get_current_user)):
+    if TRUFORM_BASE_URL:
+        source = HttpTruformSource(get_http_client(http_request), TRUFORM_BASE_URL)
+    else:
+        source = StandInSource()
+    if request.all:
+        ids = await source.list_ids()
+    elif request.ids:
+        ids = list(dict.fromkeys(request.ids))
+    else:
+        raise HTTPException(status_code=400, detail="Provide ids or set all")
+    stats = await ingest_truform_records(db, source, ids, current_user['google_id'], modification_time())
+    # Bulk inserts bypass the incremental dashboard rollup.
+    background_tasks.add_task(stats_rollup.reconcile, db)
+    return stats
+
 @router.get("/truform/{id}")
 async def get_truform_data(id: str):
-    patient_data = mock_truform_data.get(id)
+    await simulate_latency()
+    patient_data = stand_in_record(id)
     if patient_data:
         return patient_data
-    raise HTTPException(status_code=404, detail="Patient not found")
\ No newline at end of file
+    raise HTTPException(status_code=404, detail="Patient not found")
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import os
+
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+AUDIT_BATCH_SIZE = int(os.environ.get("AUDIT_BATCH_SIZE", 500))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get("AUDIT_FLUSH_INTERVAL", 1.0))
+AUDIT_QUEUE_SIZE = int(os.environ.get("AUDIT_QUEUE_SIZE", 10000))
+
+# Recorded on the entry itself (actor, at) rather than as field changes.
+UNAUDITED_FIELDS = {"_id", "lastModified", "modifiedBy"}
+# Built from sets by the scorer, so their order varies between processes.
+UNORDERED_FIELDS = {"criticalAlerts", "preOpRecommendations"}
+
+
+def diff_documents(before, after):
+    """Field-level changes between two versions of a patient document."""
+    changes = {}
+    for field in {**before, **after}:
+        if field in UNAUDITED_FIELDS:
+            continue
+        old, new = before.get(field), after.get(field)
+        if field in UNORDERED_FIELDS and old is not None and new is not None:
+            changed = set(old) != set(new)
+        else:
+            changed = old != new
+        if changed:
+            changes[field] = {"before": old, "after": new}
+    return changes
+
+
+def audit_entry(action, patient_id, before, after, actor, at):
+    return {
+        "patientId": patient_id,
+        "action": action,
+        "changes": diff_documents(before or {}, after or {}),
+        "actor": actor,
+        "at": at,
+    }
+
+
+class AuditTrail:
+    """Write-behind buffer for ``patient_audit`` entries.
+
+    Entries are queued in process and a single writer inserts them in batches
+    of up to ``batch_size``, or whatever arrived within ``flush_interval`` of
+    the first queued entry. The queue is bounded, so a stalled database slows
+    writers down instead of growing memory without limit. ``stop`` drains the
+    queue before returning. When no writer is running (scripts, benchmarks)
+    entries are written straight away.
+    """
+
+    def __init__(self, batch_size=AUDIT_BATCH_SIZE, flush_interval=AUDIT_FLUSH_INTERVAL, max_queue=AUDIT_QUEUE_SIZE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.queue = None
+        self.task = None
+        self.written = 0
+        self.failed = 0
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if not self.running:
+            return
+        await self.queue.put(None)
+        await self.task
+        self.task = None
+
+    async def record(self, db, entry):
+        if self.running:
+            await self.queue.put((db, entry))
+        else:
+            await self._write(db, [entry])
+
+    async def _write(self, db, batch):
+        try:
+            await db.patient_audit.insert_many(batch, ordered=False)
+            self.written += len(batch)
+        except PyMongoError as e:
+            self.failed += len(batch)
+            logger.error("Could not write %d audit entries: %s", len(batch), e)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self.queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            # Entries carry the database they belong to; in practice that
+            # is always the same one, so this is a single insert.
+            groups = {}
+            for db, entry in batch:
+                groups.setdefault(id(db), (db, []))[1].append(entry)
+            for db, entries in groups.values():
+                await self._write(db, entries)
+
+
+audit_trail = AuditTrail()
@@ -1,11 +1,78 @@
+from collections import OrderedDict
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
 import jwt
 import os
+import time
 from db import get_database
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+JWT_SECRET = os.environ.get("JWT_SECRET")
+
+
+class PrincipalCache:
+    """Bounded LRU of user documents keyed by token ``sub``.
+
+    An entry lives for ``ttl`` seconds, or until the token that loaded it
+    expires if that comes first. Writes to a user go through ``update_user``,
+    which drops its entry, and every login drops it too. Callers get a copy,
+    so handlers can mutate the user dict freely.
+    """
+
+    def __init__(self, max_size=1024, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, sub):
+        entry = self.entries.get(sub)
+        if entry is not None:
+            user, expires_at = entry
+            if expires_at > time.monotonic():
+                self.entries.move_to_end(sub)
+                self.hits += 1
+                return dict(user)
+            del self.entries[sub]
+        self.misses += 1
+        return None
+
+    def put(self, sub, user, token_exp=None):
+        lifetime = self.ttl
+        if token_exp is not None:
+            lifetime = min(lifetime, token_exp - time.time())
+        if lifetime <= 0:
+            return
+        self.entries[sub] = (dict(user), time.monotonic() + lifetime)
+        self.entries.move_to_end(sub)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, sub):
+        self.entries.pop(sub, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+principal_cache = PrincipalCache(
+    max_size=int(os.environ.get("PRINCIPAL_CACHE_SIZE", 1024)),
+    ttl=float(os.environ.get("PRINCIPAL_CACHE_TTL", 300)),
+)
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme), db = Depends(get_database)):
     credentials_exception = HTTPException(
         status_code=401,
@@ -13,16 +80,26 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db = Depends(get
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        JWT_SECRET = os.environ.get("JWT_SECRET")
         payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
         google_id: str = payload.get("sub")
         if google_id is None:
             raise credentials_exception
     except jwt.PyJWTError:
         raise credentials_exception
-    
+
+    user = principal_cache.get(google_id)
+    if user is not None:
+        return user
+
     user = await db.users.find_one({"google_id": google_id})
     if user is None:
         raise credentials_exception
     user["_id"] = str(user["_id"])
-    return user
\ No newline at end of file
+    principal_cache.put(google_id, user, payload.get("exp"))
+    return user
+
+
+async def update_user(db, google_id, changes):
+    """Applies ``changes`` to a user and drops its cached principal."""
+    await db.users.update_one({"google_id": google_id}, {"$set": changes})
+    principal_cache.invalidate(google_id)
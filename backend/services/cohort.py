@@ -0,0 +1,172 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from services.risk_assessment import SCORE_INPUT_FIELDS
+from services.risk_batch import DEFAULT_THRESHOLDS, RISK_CATEGORIES, FeatureMatrix, build_feature_matrix, score_matrix
+
+COHORT_REFRESH_SECONDS = float(os.environ.get("COHORT_REFRESH_SECONDS", 60))
+# Full reloads also pick up ages crossing the threshold and any changes the
+# incremental refresh missed.
+COHORT_RELOAD_SECONDS = float(os.environ.get("COHORT_RELOAD_SECONDS", 3600))
+COHORT_LOAD_BATCH_SIZE = int(os.environ.get("COHORT_LOAD_BATCH_SIZE", 5000))
+# Incremental refreshes look back this far past the previous one, to cover
+# writes stamped before they landed (ingestion, write-behind audit entries).
+COHORT_REFRESH_OVERLAP = timedelta(seconds=float(os.environ.get("COHORT_REFRESH_OVERLAP_SECONDS", 60)))
+
+CATEGORY_LABELS = [str(label) for label in RISK_CATEGORIES[1:]]
+COLUMNS = ["features", "ages", "mallampati", "surgical", "valid"]
+
+
+def _camel(name):
+    head, *rest = name.split("_")
+    return head + "".join(part.capitalize() for part in rest)
+
+
+THRESHOLD_NAMES = {_camel(name): name for name in DEFAULT_THRESHOLDS._fields}
+
+
+def thresholds_from(overrides):
+    """Current rule cutoffs with the given camelCase overrides applied."""
+    return DEFAULT_THRESHOLDS._replace(**{
+        THRESHOLD_NAMES[name]: value for name, value in overrides.items() if value is not None
+    })
+
+
+class CohortSnapshot:
+    """Columnar scoring inputs for every patient, for what-if evaluation.
+
+    One row per patient holds the keyword feature bitset, age, Mallampati
+    score and surgical-history flag (about 14 bytes), so the whole population
+    can be rescored with score_matrix in a few vectorized passes. Rows are
+    loaded once, then refreshed from patients modified since the previous
+    refresh and deletes recorded in patient_audit. Deleted rows are marked
+    invalid and dropped on the next full reload.
+    """
+
+    def __init__(self):
+        self.columns = None
+        self.rows = {}
+        self.size = 0
+        self.baseline = None
+        self.loaded_at = None
+        self.refreshed_at = None
+        self.refresh_from = None
+        self.lock = None
+
+    def __len__(self):
+        return int(self.columns["valid"][:self.size].sum()) if self.columns else 0
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values()) if self.columns else 0
+
+    def matrix(self):
+        return FeatureMatrix(*(self.columns[name][:self.size] for name in COLUMNS))
+
+    def _reserve(self, count):
+        capacity = len(self.columns["valid"])
+        if self.size + count <= capacity:
+            return
+        capacity = max(self.size + count, capacity * 2, 1024)
+        for name, column in self.columns.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    def _upsert(self, ids, matrix):
+        self._reserve(len(ids))
+        for i, patient_id in enumerate(ids):
+            row = self.rows.get(patient_id)
+            if row is None:
+                row = self.rows[patient_id] = self.size
+                self.size += 1
+            for name in COLUMNS:
+                self.columns[name][row] = getattr(matrix, name)[i]
+
+    async def _read(self, db, query):
+        projection = {field: 1 for field in SCORE_INPUT_FIELDS}
+        batch = []
+        async for document in db.patients.find(query, projection, batch_size=COHORT_LOAD_BATCH_SIZE):
+            batch.append(document)
+            if len(batch) >= COHORT_LOAD_BATCH_SIZE:
+                self._upsert([d["_id"] for d in batch], await run_in_threadpool(build_feature_matrix, batch))
+                batch = []
+        if batch:
+            self._upsert([d["_id"] for d in batch], await run_in_threadpool(build_feature_matrix, batch))
+
+    async def load(self, db):
+        started = datetime.now()
+        empty = build_feature_matrix([])
+        self.columns = {name: getattr(empty, name) for name in COLUMNS}
+        self.rows = {}
+        self.size = 0
+        await self._read(db, {})
+        self.baseline = None
+        self.loaded_at = self.refreshed_at = time.monotonic()
+        self.refresh_from = started
+
+    async def refresh(self, db):
+        started = datetime.now()
+        since = self.refresh_from - COHORT_REFRESH_OVERLAP
+        await self._read(db, {"lastModified": {"$gte": since}})
+        async for entry in db.patient_audit.find({"action": "delete", "at": {"$gte": since}}, {"patientId": 1}):
+            row = self.rows.get(entry["patientId"])
+            if row is not None:
+                self.columns["valid"][row] = False
+        self.baseline = None
+        self.refreshed_at = time.monotonic()
+        self.refresh_from = started
+
+    async def ensure_fresh(self, db):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            now = time.monotonic()
+            if self.columns is None or now - self.loaded_at > COHORT_RELOAD_SECONDS:
+                await self.load(db)
+            elif now - self.refreshed_at > COHORT_REFRESH_SECONDS:
+                await self.refresh(db)
+
+    def evaluate(self, thresholds):
+        """Category transitions from the current rules to ``thresholds``."""
+        start = time.perf_counter()
+        matrix = self.matrix()
+        if self.baseline is None:
+            self.baseline = score_matrix(matrix)["riskCategory"]
+        proposed = score_matrix(matrix, thresholds)["riskCategory"]
+        valid = matrix.valid
+        # Categories are 1..3 for valid rows; row = current, column = proposed.
+        counts = np.bincount(
+            self.baseline[valid].astype(np.int64) * 4 + proposed[valid], minlength=16,
+        ).reshape(4, 4)[1:, 1:]
+        transitions = {
+            current: dict(zip(CATEGORY_LABELS, row))
+            for current, row in zip(CATEGORY_LABELS, counts.tolist())
+        }
+        total = int(counts.sum())
+        return {
+            "patients": total,
+            "changed": total - int(np.trace(counts)),
+            "current": dict(zip(CATEGORY_LABELS, counts.sum(axis=1).tolist())),
+            "proposed": dict(zip(CATEGORY_LABELS, counts.sum(axis=0).tolist())),
+            "transitions": transitions,
+            "thresholds": {_camel(name): value for name, value in thresholds._asdict().items()},
+            "elapsedMs": (time.perf_counter() - start) * 1000,
+        }
+
+    def status(self):
+        return {
+            "patients": len(self),
+            "rows": self.size,
+            "bytes": self.nbytes,
+            "loadedSecondsAgo": time.monotonic() - self.loaded_at if self.loaded_at else None,
+            "refreshedSecondsAgo": time.monotonic() - self.refreshed_at if self.refreshed_at else None,
+        }
+
+
+cohort_snapshot = CohortSnapshot()
@@ -0,0 +1,260 @@
+import argparse
+import asyncio
+import csv
+import io
+import os
+import sys
+from datetime import datetime
+
+from bson import ObjectId
+from starlette.concurrency import run_in_threadpool
+
+from services.risk_assessment import RISK_METADATA_FIELDS, SCORE_INPUT_FIELDS, scores_are_stale
+from services.risk_batch import score_batch
+from services.serialization import ChunkSink
+
+# Parquet and Arrow output need the optional pyarrow package; CSV is always
+# available.
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+PYARROW_AVAILABLE = pa is not None
+
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 2000))
+
+EXPORT_FIELDS = [
+    "name", "dateOfBirth", "asaScore", "stopBangScore", "rcriScore", "metsScore", "riskCategory",
+    "criticalAlerts", "preOpRecommendations", "completedRecommendations",
+    "riskRulesVersion", "lastModified", "modifiedBy",
+]
+LIST_FIELDS = {"criticalAlerts", "preOpRecommendations", "completedRecommendations"}
+INT_FIELDS = {"asaScore", "stopBangScore", "rcriScore", "metsScore", "riskRulesVersion"}
+COLUMNS = ["id"] + EXPORT_FIELDS
+LIST_SEPARATOR = "; "
+
+FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+EXTENSIONS = {"csv": "csv", "parquet": "parquet", "arrow": "arrows"}
+
+
+def export_query(risk_categories=None, modified_from=None, modified_to=None, after=None):
+    """Filter for an export; ``after`` resumes past the last exported _id."""
+    clauses = []
+    if risk_categories:
+        clauses.append({"riskCategory": {"$in": list(risk_categories)}})
+    if modified_from or modified_to:
+        modified = {}
+        if modified_from:
+            modified["$gte"] = modified_from
+        if modified_to:
+            modified["$lt"] = modified_to
+        clauses.append({"lastModified": modified})
+    if after:
+        clauses.append({"_id": {"$gt": ObjectId(after)}})
+    return {"$and": clauses} if len(clauses) > 1 else (clauses[0] if clauses else {})
+
+
+def _refresh_stale(batch):
+    # Rows scored under older rules or age bands are exported with current
+    # scores; the stored ones are left for the next read or rescore to fix.
+    stale = [document for document in batch if scores_are_stale(document)]
+    for document, scores in zip(stale, score_batch(stale)):
+        document.update(scores)
+    return batch
+
+
+async def iter_batches(db, query, batch_size=EXPORT_BATCH_SIZE):
+    # _id order is what makes an interrupted export resumable with ``after``.
+    projection = {field: 1 for field in EXPORT_FIELDS + SCORE_INPUT_FIELDS + RISK_METADATA_FIELDS}
+    cursor = db.patients.find(query, projection, sort=[("_id", 1)], batch_size=batch_size)
+    batch = []
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield await run_in_threadpool(_refresh_stale, batch)
+            batch = []
+    if batch:
+        yield await run_in_threadpool(_refresh_stale, batch)
+
+
+def _row(document):
+    row = [str(document["_id"])]
+    for field in EXPORT_FIELDS:
+        value = document.get(field)
+        if field in LIST_FIELDS:
+            value = LIST_SEPARATOR.join(value or [])
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        row.append(value)
+    return row
+
+
+class CsvEncoder:
+    def __init__(self, header=True):
+        self.header = header
+
+    def encode(self, batch):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if self.header:
+            writer.writerow(COLUMNS)
+            self.header = False
+        writer.writerows(_row(document) for document in batch)
+        return buffer.getvalue().encode()
+
+    def close(self):
+        return b""
+
+
+def arrow_schema():
+    fields = [pa.field("id", pa.string())]
+    for field in EXPORT_FIELDS:
+        if field in LIST_FIELDS:
+            fields.append(pa.field(field, pa.list_(pa.string())))
+        elif field in INT_FIELDS:
+            fields.append(pa.field(field, pa.int64()))
+        elif field == "lastModified":
+            fields.append(pa.field(field, pa.timestamp("ms")))
+        else:
+            fields.append(pa.field(field, pa.string()))
+    return pa.schema(fields)
+
+
+class ArrowEncoder:
+    """Writes each batch as one Parquet row group or Arrow record batch."""
+
+    def __init__(self, fmt):
+        self.sink = ChunkSink()
+        self.schema = arrow_schema()
+        if fmt == "parquet":
+            self.writer = pq.ParquetWriter(self.sink, self.schema)
+        else:
+            self.writer = pa.ipc.new_stream(self.sink, self.schema)
+
+    def encode(self, batch):
+        columns = {"id": [str(document["_id"]) for document in batch]}
+        for field in EXPORT_FIELDS:
+            columns[field] = [document.get(field) for document in batch]
+        table = pa.Table.from_pydict(columns, schema=self.schema)
+        self.writer.write_table(table)
+        return self.sink.drain()
+
+    def close(self):
+        self.writer.close()
+        return self.sink.drain()
+
+
+def make_encoder(fmt, header=True):
+    if fmt == "csv":
+        return CsvEncoder(header)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if not PYARROW_AVAILABLE:
+        raise ValueError(f"The {fmt} format needs pyarrow installed")
+    return ArrowEncoder(fmt)
+
+
+async def stream_export(db, query, fmt="csv", batch_size=EXPORT_BATCH_SIZE, header=True):
+    """Yields the encoded export one cursor batch at a time.
+
+    Only one batch of documents is held at once, so memory use does not
+    depend on the size of the collection.
+    """
+    encoder = make_encoder(fmt, header)
+    async for batch in iter_batches(db, query, batch_size):
+        yield encoder.encode(batch)
+    yield encoder.close()
+
+
+def _trim_partial_row(path):
+    # An export interrupted mid-write can leave half a row behind.
+    with open(path, "rb+") as f:
+        position = f.seek(0, os.SEEK_END)
+        while position > 0:
+            step = min(4096, position)
+            position -= step
+            f.seek(position)
+            newline = f.read(step).rfind(b"\n")
+            if newline != -1:
+                f.truncate(position + newline + 1)
+                return
+        f.truncate(0)
+
+
+def last_exported_id(path):
+    """The id on the last row of a CSV export, for resuming it in place."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        tail = b""
+        while position > 0 and tail.count(b"\n") < 2:
+            step = min(4096, position)
+            position -= step
+            f.seek(position)
+            tail = f.read(step) + tail
+    lines = [line for line in tail.decode(errors="replace").splitlines() if line]
+    if not lines or lines[-1].startswith("id,"):
+        return None
+    return next(csv.reader([lines[-1]]))[0]
+
+
+async def export_to_file(db, path, fmt="csv", risk_categories=None, modified_from=None, modified_to=None, after=None, resume=False):
+    """Writes an export to ``path``.
+
+    With ``resume`` a CSV export continues after its last row; Parquet and
+    Arrow files cannot be appended to, so they resume into a new file with
+    ``after`` set to the last id reported.
+    """
+    mode = "wb"
+    header = True
+    if resume:
+        if fmt != "csv":
+            raise ValueError("Only CSV exports can be resumed in place; pass --after instead")
+        if os.path.exists(path):
+            _trim_partial_row(path)
+            after = last_exported_id(path) or after
+            header = os.path.getsize(path) == 0
+            mode = "ab"
+    query = export_query(risk_categories, modified_from, modified_to, after)
+    rows = 0
+    last_id = after
+    encoder = make_encoder(fmt, header)
+    with open(path, mode) as f:
+        async for batch in iter_batches(db, query):
+            f.write(encoder.encode(batch))
+            f.flush()
+            rows += len(batch)
+            last_id = str(batch[-1]["_id"])
+            print(f"Exported {rows} patients, last id {last_id}", file=sys.stderr)
+        f.write(encoder.close())
+    return {"rows": rows, "lastId": last_id}
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Export the patient registry.")
+    parser.add_argument("output")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("--risk-category", action="append", dest="risk_categories")
+    parser.add_argument("--modified-from", type=datetime.fromisoformat)
+    parser.add_argument("--modified-to", type=datetime.fromisoformat)
+    parser.add_argument("--after", help="Only export patients after this _id.")
+    parser.add_argument("--resume", action="store_true", help="Continue a partial CSV export in place.")
+    args = parser.parse_args()
+
+    from db import get_database
+    db = await get_database()
+    result = await export_to_file(
+        db, args.output, args.format, args.risk_categories, args.modified_from, args.modified_to, args.after, args.resume,
+    )
+    print(f"Exported {result['rows']} patients to {args.output}, last id {result['lastId']}")
+
+
+if __name__ == "__main__":
+    # Run from the backend directory: python -m services.export patients.csv
+    asyncio.run(_main())
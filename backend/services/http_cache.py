@@ -0,0 +1,76 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Response
+
+VERSIONS_COLLECTION = "collection_versions"
+# Browsers may keep responses but must revalidate them on every use.
+CACHE_CONTROL = "private, no-cache"
+
+
+def patient_version(patient):
+    # Stale scores are refreshed on read without bumping lastModified, so the
+    # rules version and input fingerprint are part of the version as well.
+    last_modified = patient.get("lastModified")
+    stamp = last_modified.isoformat() if hasattr(last_modified, "isoformat") else str(last_modified)
+    scores = f"{patient.get('riskRulesVersion')}:{patient.get('riskFingerprint')}"
+    return hashlib.sha256(f"{patient['_id']}:{stamp}:{scores}".encode()).hexdigest()
+
+
+def _utc(value):
+    # lastModified is stored as naive local time (see modification_time).
+    return value.astimezone(timezone.utc)
+
+
+def validators(etag, last_modified=None):
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if isinstance(last_modified, datetime):
+        headers["Last-Modified"] = format_datetime(_utc(last_modified), usegmt=True)
+    return headers
+
+
+def patient_validators(patient):
+    return validators(f'"{patient_version(patient)}"', patient.get("lastModified"))
+
+
+def is_not_modified(request, etag, last_modified=None):
+    """Evaluates If-None-Match, or If-Modified-Since when no ETag was sent."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and isinstance(last_modified, datetime):
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have one-second resolution.
+        return _utc(last_modified).replace(microsecond=0) <= since
+    return False
+
+
+def not_modified(headers):
+    return Response(status_code=304, headers=headers)
+
+
+async def collection_version(db, name):
+    document = await db[VERSIONS_COLLECTION].find_one({"_id": name})
+    return document["version"] if document else 0
+
+
+async def bump_collection_version(db, name):
+    """Marks every cached list of ``name`` as outdated.
+
+    Called after a write lands, so a list read in between is at worst served
+    with the old version and revalidated again on the next poll.
+    """
+    await db[VERSIONS_COLLECTION].update_one({"_id": name}, {"$inc": {"version": 1}}, upsert=True)
+
+
+def list_etag(version, *parts):
+    key = ":".join(str(part) for part in (version, *parts))
+    return f'"{hashlib.sha256(key.encode()).hexdigest()}"'
@@ -0,0 +1,66 @@
+import asyncio
+import importlib.util
+import logging
+import os
+
+import httpx
+from fastapi import Request
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional h2 package (httpx[http2]); without it the client
+# falls back to pooled HTTP/1.1 connections.
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+TIMEOUT = httpx.Timeout(
+    float(os.environ.get("HTTP_TIMEOUT", 10.0)),
+    connect=float(os.environ.get("HTTP_CONNECT_TIMEOUT", 3.0)),
+)
+LIMITS = httpx.Limits(
+    max_connections=int(os.environ.get("HTTP_MAX_CONNECTIONS", 100)),
+    max_keepalive_connections=int(os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20)),
+    keepalive_expiry=float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", 60.0)),
+)
+MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", 3))
+BACKOFF_BASE = float(os.environ.get("HTTP_BACKOFF_BASE", 0.2))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def create_http_client(transport=None):
+    """Builds the shared outbound client; ``transport`` lets tests stub it."""
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        timeout=TIMEOUT,
+        limits=LIMITS,
+        transport=transport,
+    )
+
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.http_client
+
+
+async def request_with_retry(client, method, url, idempotent=True, **kwargs):
+    """Sends a request, retrying with exponential backoff.
+
+    Connection failures are always retried because nothing reached the server.
+    Read errors and 429/5xx responses are only retried for idempotent calls;
+    a one-time OAuth code, for example, must not be exchanged twice.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        last_attempt = attempt == MAX_RETRIES
+        try:
+            response = await client.request(method, url, **kwargs)
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+            if last_attempt:
+                raise
+            logger.warning("%s %s failed to connect (%s), retrying", method, url, e)
+        except httpx.TransportError as e:
+            if last_attempt or not idempotent:
+                raise
+            logger.warning("%s %s failed (%s), retrying", method, url, e)
+        else:
+            if last_attempt or not idempotent or response.status_code not in RETRY_STATUSES:
+                return response
+            logger.warning("%s %s returned %d, retrying", method, url, response.status_code)
+        await asyncio.sleep(BACKOFF_BASE * 2 ** attempt)
@@ -0,0 +1,112 @@
+import logging
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from services.pagination import NAME_COLLATION
+
+logger = logging.getLogger(__name__)
+
+# Indexes each collection needs, keyed by collection name. The patients sort
+# indexes end in _id to back the keyset pagination in services.pagination.
+INDEXES = {
+    "users": [
+        IndexModel([("google_id", ASCENDING)], name="google_id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "patients": [
+        IndexModel([("name", ASCENDING), ("_id", ASCENDING)], name="name_id_ci", collation=NAME_COLLATION),
+        IndexModel([("dateOfBirth", ASCENDING), ("_id", ASCENDING)], name="dateOfBirth_id"),
+        IndexModel([("lastModified", DESCENDING), ("_id", DESCENDING)], name="lastModified_id"),
+        IndexModel([("riskSeverity", ASCENDING), ("_id", ASCENDING)], name="riskSeverity_id"),
+        # Makes Truform re-ingestion idempotent; manually created patients
+        # have no truformId and are not constrained.
+        IndexModel(
+            [("truformId", ASCENDING)],
+            name="truformId_unique",
+            unique=True,
+            partialFilterExpression={"truformId": {"$type": "string"}},
+        ),
+    ],
+    "patient_audit": [
+        IndexModel([("patientId", ASCENDING), ("at", DESCENDING), ("_id", DESCENDING)], name="patientId_at_id"),
+    ],
+}
+
+# Hot queries whose plans are checked after the indexes are in place:
+# (collection, filter, sort, collation).
+CHECKED_QUERIES = [
+    ("users", {"google_id": ""}, None, None),
+    ("patients", {}, [("name", ASCENDING), ("_id", ASCENDING)], NAME_COLLATION),
+    ("patients", {}, [("lastModified", DESCENDING), ("_id", DESCENDING)], None),
+    ("patients", {}, [("riskSeverity", ASCENDING), ("_id", ASCENDING)], None),
+    ("patients", {}, [("dateOfBirth", ASCENDING), ("_id", ASCENDING)], None),
+    ("patient_audit", {"patientId": None}, [("at", DESCENDING), ("_id", DESCENDING)], None),
+]
+
+
+def _has_stage(plan, stage):
+    if isinstance(plan, dict):
+        if plan.get("stage") == stage:
+            return True
+        return any(_has_stage(value, stage) for value in plan.values())
+    if isinstance(plan, list):
+        return any(_has_stage(value, stage) for value in plan)
+    return False
+
+
+def _collation_key(collation):
+    # The server reports every collation option; only these are ever set here.
+    return (collation.get("locale"), collation.get("strength")) if collation else None
+
+
+async def create_missing_indexes(db):
+    created = []
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        existing_keys = {
+            (tuple(tuple(key) for key in info["key"]), _collation_key(info.get("collation")))
+            for info in existing.values()
+        }
+        for index in indexes:
+            document = index.document
+            keys = (tuple(document["key"].items()), _collation_key(document.get("collation")))
+            if document["name"] in existing or keys in existing_keys:
+                continue
+            try:
+                await collection.create_indexes([index])
+                created.append(f"{collection_name}.{document['name']}")
+            except OperationFailure as e:
+                # Typically duplicate values blocking a unique index; the rest
+                # of the indexes are still worth creating.
+                logger.error("Could not create index %s on %s: %s", document["name"], collection_name, e)
+    if created:
+        logger.info("Created indexes: %s", ", ".join(created))
+    return created
+
+
+async def find_collection_scans(db):
+    scans = []
+    for collection_name, query, sort, collation in CHECKED_QUERIES:
+        cursor = db[collection_name].find(query, limit=1, collation=collation)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = await cursor.explain()
+        if _has_stage(plan.get("queryPlanner", plan), "COLLSCAN"):
+            logger.warning("Query on %s %s sort=%s uses a collection scan", collection_name, query, sort)
+            scans.append((collection_name, query, sort))
+    return scans
+
+
+async def ensure_indexes(db):
+    """Creates missing indexes, then checks hot queries for collection scans.
+
+    Meant to run as a background task at startup; failures are logged rather
+    than raised so they never take the app down.
+    """
+    try:
+        await create_missing_indexes(db)
+        await find_collection_scans(db)
+    except Exception as e:
+        logger.error("Index bootstrap failed: %s", e)
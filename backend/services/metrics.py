@@ -0,0 +1,116 @@
+import time
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from pymongo import monitoring
+
+# Collections whose commands are timed individually; everything else is
+# reported under "other" to keep label cardinality bounded.
+MONITORED_COLLECTIONS = {"patients", "users"}
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ["method", "route"],
+)
+REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP responses by route template and status code.",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served.")
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command latency by collection and command.",
+    ["collection", "command", "outcome"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+RISK_ASSESSMENT_LATENCY = Histogram(
+    "risk_assessment_duration_seconds",
+    "Time spent in assess_risk.",
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01),
+)
+REPORT_RENDER_LATENCY = Histogram(
+    "report_render_duration_seconds",
+    "Time to render a PDF report, including waiting for a worker.",
+)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streamed responses are timed to the last byte."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # The route template (not the raw path) keeps label values bounded.
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            REQUEST_LATENCY.labels(method, route_path).observe(time.perf_counter() - start)
+            REQUESTS.labels(method, route_path, str(status)).inc()
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def __init__(self):
+        self.pending = {}
+
+    def started(self, event):
+        # Most commands name their collection under the command name;
+        # getMore names the cursor id there and the collection separately.
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        else:
+            collection = event.command.get(event.command_name)
+        if not isinstance(collection, str) or collection not in MONITORED_COLLECTIONS:
+            collection = "other"
+        self.pending[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event, outcome):
+        collection = self.pending.pop((event.connection_id, event.request_id), "other")
+        MONGO_COMMAND_LATENCY.labels(collection, event.command_name, outcome).observe(event.duration_micros / 1e6)
+
+    def succeeded(self, event):
+        self._finish(event, "success")
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+
+class CacheStatsCollector:
+    """Exposes the in-process caches' own counters at scrape time."""
+
+    def __init__(self):
+        self.caches = {}
+
+    def register(self, name, cache):
+        self.caches[name] = cache
+
+    def collect(self):
+        family = GaugeMetricFamily("cache_stat", "In-process cache statistics.", labels=["cache", "stat"])
+        for name, cache in self.caches.items():
+            for stat, value in cache.stats().items():
+                family.add_metric([name, stat], value)
+        yield family
+
+
+cache_stats = CacheStatsCollector()
+REGISTRY.register(cache_stats)
@@ -0,0 +1,76 @@
+import base64
+import re
+
+from bson import json_util
+from fastapi import HTTPException
+
+SORT_FIELDS = ["name", "dateOfBirth", "riskCategory", "lastModified"]
+# riskCategory sorts by severity (Low < Moderate < High), not alphabetically.
+SORT_KEYS = {"riskCategory": "riskSeverity"}
+# Names sort case-insensitively, as the patient list does client-side. The
+# name index is built with the same collation, which queries must match to
+# use it.
+NAME_COLLATION = {"locale": "en", "strength": 2}
+SORT_DIRECTIONS = {"asc": 1, "desc": -1}
+
+
+def encode_cursor(document, sort_by):
+    payload = json_util.dumps([document.get(sort_by), document["_id"]])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        value, last_id = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, last_id
+
+
+def search_filter(search):
+    if not search:
+        return {}
+    pattern = {"$regex": re.escape(search), "$options": "i"}
+    return {"$or": [{"name": pattern}, {"dateOfBirth": pattern}]}
+
+
+def keyset_filter(sort_by, direction, cursor):
+    """Matches the documents that come after ``cursor`` in (sort_by, _id) order.
+
+    MongoDB orders missing/null values before everything else and range
+    operators never match null, so null sort values need their own branches.
+    """
+    value, last_id = decode_cursor(cursor)
+    after = "$gt" if direction == 1 else "$lt"
+    if value is None:
+        clauses = [{sort_by: None, "_id": {after: last_id}}]
+        if direction == 1:
+            clauses.append({sort_by: {"$ne": None}})
+    else:
+        clauses = [{sort_by: {after: value}}, {sort_by: value, "_id": {after: last_id}}]
+        if direction == -1:
+            clauses.append({sort_by: None})
+    return {"$or": clauses}
+
+
+def build_list_query(search, sort_by, sort_dir, cursor):
+    """Returns the filter, sort and collation for one page of the patient list.
+
+    Cursors hold the value of the stored sort key, so they come from
+    ``encode_cursor(document, sort[0][0])``.
+    """
+    if sort_by not in SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sortBy must be one of {', '.join(SORT_FIELDS)}")
+    if sort_dir not in SORT_DIRECTIONS:
+        raise HTTPException(status_code=400, detail="sortDir must be 'asc' or 'desc'")
+    direction = SORT_DIRECTIONS[sort_dir]
+    sort_key = SORT_KEYS.get(sort_by, sort_by)
+
+    clauses = []
+    if search:
+        clauses.append(search_filter(search))
+    if cursor:
+        clauses.append(keyset_filter(sort_key, direction, cursor))
+    query = {"$and": clauses} if len(clauses) > 1 else (clauses[0] if clauses else {})
+    collation = NAME_COLLATION if sort_by == "name" else None
+    return query, [(sort_key, direction), ("_id", direction)], collation
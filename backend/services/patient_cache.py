@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+PATIENT_CACHE_SIZE = int(os.environ.get("PATIENT_CACHE_SIZE", 5000))
+# Entry lifetime while the change stream is keeping the cache coherent; it
+# only bounds the damage of a missed event.
+PATIENT_CACHE_TTL = float(os.environ.get("PATIENT_CACHE_TTL", 300))
+# Entry lifetime when change streams are unavailable (standalone mongod) and
+# other workers' writes are only picked up by expiry.
+PATIENT_CACHE_FALLBACK_TTL = float(os.environ.get("PATIENT_CACHE_FALLBACK_TTL", 5))
+CHANGE_STREAM_RETRY_SECONDS = float(os.environ.get("CHANGE_STREAM_RETRY_SECONDS", 30))
+
+
+class PatientCache:
+    """Bounded per-worker read-through cache of patient documents.
+
+    Cached documents carry their stored scores, so hits skip both the read
+    and re-scoring. Each worker tails a change stream on ``patients`` and
+    evicts entries as they change anywhere; when the stream cannot be opened
+    (it needs a replica set) entries simply expire after the fallback TTL.
+
+    A read that races with an eviction is not cached: ``generation`` is
+    sampled before the read and the result is only stored if no eviction
+    happened in between.
+    """
+
+    def __init__(self, max_size=PATIENT_CACHE_SIZE, ttl=PATIENT_CACHE_TTL, fallback_ttl=PATIENT_CACHE_FALLBACK_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.fallback_ttl = fallback_ttl
+        self.entries = OrderedDict()
+        self.generation = 0
+        self.streaming = False
+        self.task = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def current_ttl(self):
+        return self.ttl if self.streaming else self.fallback_ttl
+
+    def get(self, patient_id):
+        entry = self.entries.get(patient_id)
+        if entry is None or time.monotonic() - entry[0] > self.current_ttl:
+            if entry is not None:
+                del self.entries[patient_id]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(patient_id)
+        self.hits += 1
+        # Callers refresh scores and render in place; the cached copy stays
+        # as stored.
+        return dict(entry[1])
+
+    def put(self, patient_id, document, generation):
+        if generation != self.generation or self.max_size <= 0:
+            return
+        self.entries[patient_id] = (time.monotonic(), dict(document))
+        self.entries.move_to_end(patient_id)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def evict(self, patient_id):
+        self.generation += 1
+        if self.entries.pop(patient_id, None) is not None:
+            self.evictions += 1
+
+    def clear(self):
+        self.generation += 1
+        self.evictions += len(self.entries)
+        self.entries.clear()
+
+    async def find_one(self, db, patient_id):
+        patient = self.get(patient_id)
+        if patient is not None:
+            return patient
+        generation = self.generation
+        patient = await db.patients.find_one({"_id": patient_id})
+        if patient is not None:
+            self.put(patient_id, patient, generation)
+        return patient
+
+    def start(self, db):
+        self.task = asyncio.create_task(self._watch(db))
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+        self.streaming = False
+
+    async def _watch(self, db):
+        resume_token = None
+        warned = False
+        while True:
+            try:
+                async with db.patients.watch(resume_after=resume_token) as stream:
+                    if not self.streaming:
+                        # Anything cached before the stream opened may have
+                        # missed its invalidation.
+                        self.clear()
+                        self.streaming = True
+                        warned = False
+                        logger.info("Patient cache is following the patients change stream")
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        patient_id = change.get("documentKey", {}).get("_id")
+                        if patient_id is None:
+                            # drop, rename, invalidate and the like.
+                            self.clear()
+                            resume_token = None
+                        else:
+                            self.evict(patient_id)
+                # The stream closed (after an invalidate); reopen right away.
+                self.streaming = False
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.streaming:
+                    self.clear()
+                self.streaming = False
+                resume_token = None
+                if not warned:
+                    logger.warning("Patient change stream unavailable, caching with a %ss TTL: %s", self.fallback_ttl, e)
+                    warned = True
+                await asyncio.sleep(CHANGE_STREAM_RETRY_SECONDS)
+
+    def stats(self):
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "streaming": int(self.streaming),
+        }
+
+
+patient_cache = PatientCache()
@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from fpdf import FPDF
+from services.metrics import REPORT_RENDER_LATENCY
+from services.http_cache import patient_version
+from services.serialization import ChunkSink
+
+logger = logging.getLogger(__name__)
+
+# Only these fields are shipped to the render workers.
+REPORT_FIELDS = [
+    "name", "dateOfBirth", "asaScore", "stopBangScore", "rcriScore", "metsScore",
+    "riskCategory", "criticalAlerts", "preOpRecommendations",
+]
+
+REPORT_EXECUTOR = os.environ.get("REPORT_EXECUTOR", "process")
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", min(4, os.cpu_count() or 1)))
+REPORT_CACHE_MAX_BYTES = int(os.environ.get("REPORT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+REPORT_CACHE_DIR = os.environ.get("REPORT_CACHE_DIR")
+# Per worker; the oldest spilled reports are deleted beyond it.
+REPORT_CACHE_DIR_MAX_BYTES = int(os.environ.get("REPORT_CACHE_DIR_MAX_BYTES", 256 * 1024 * 1024))
+ZIP_MAX_IN_FLIGHT = int(os.environ.get("REPORT_ZIP_MAX_IN_FLIGHT", 8))
+
+
+def render_report(patient):
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+
+    pdf.cell(200, 10, txt="Patient Risk Profile", ln=True, align='C')
+
+    # Add patient details
+    pdf.cell(200, 10, txt=f"Name: {patient.get('name', 'N/A')}", ln=True)
+    pdf.cell(200, 10, txt=f"Date of Birth: {patient.get('dateOfBirth', 'N/A')}", ln=True)
+
+    # Add risk scores
+    pdf.cell(200, 10, txt=f"ASA Score: {patient.get('asaScore', 'N/A')}", ln=True)
+    pdf.cell(200, 10, txt=f"STOP-Bang Score: {patient.get('stopBangScore', 'N/A')}", ln=True)
+    pdf.cell(200, 10, txt=f"RCRI Score: {patient.get('rcriScore', 'N/A')}", ln=True)
+    pdf.cell(200, 10, txt=f"METs Score: {patient.get('metsScore', 'N/A')}", ln=True)
+
+    # Add risk category
+    pdf.cell(200, 10, txt=f"Risk Category: {patient.get('riskCategory', 'N/A')}", ln=True)
+
+    # Add critical alerts
+    pdf.cell(200, 10, txt="Critical Alerts:", ln=True)
+    for alert in patient.get('criticalAlerts', []):
+        pdf.cell(200, 10, txt=f"- {alert}", ln=True)
+
+    # Add recommendations
+    pdf.cell(200, 10, txt="Pre-Op Recommendations:", ln=True)
+    for recommendation in patient.get('preOpRecommendations', []):
+        pdf.cell(200, 10, txt=f"- {recommendation}", ln=True)
+
+    return bytes(pdf.output(dest='S'))
+
+
+def report_key(patient):
+    return patient_version(patient)
+
+
+def report_filename(patient):
+    return f"patient_{patient['_id']}_risk_profile.pdf"
+
+
+class ReportCache:
+    """LRU of rendered PDFs bounded by total size.
+
+    Keys change whenever a patient's lastModified does, so entries never need
+    invalidating. With ``spill_dir`` set, entries evicted from memory are
+    written there and read back on a later miss. A spilled file is deleted
+    once read back, and the oldest are deleted once the directory holds more
+    than ``spill_max_bytes``.
+    """
+
+    def __init__(self, max_bytes, spill_dir=None, spill_max_bytes=REPORT_CACHE_DIR_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.spilled = OrderedDict()
+        self.spilled_size = 0
+        self.hits = 0
+        self.misses = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            self._load_spilled()
+
+    def _spill_path(self, key):
+        return os.path.join(self.spill_dir, f"{key}.pdf")
+
+    def _load_spilled(self):
+        # Files left by an earlier run count towards the limit, oldest first.
+        files = [entry for entry in os.scandir(self.spill_dir) if entry.is_file() and entry.name.endswith(".pdf")]
+        for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+            self.spilled[entry.name[:-len(".pdf")]] = entry.stat().st_size
+            self.spilled_size += entry.stat().st_size
+        self._trim_spilled()
+
+    def get(self, key):
+        data = self.entries.get(key)
+        if data is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return data
+        if self.spill_dir:
+            try:
+                with open(self._spill_path(key), "rb") as f:
+                    data = f.read()
+            except OSError:
+                data = None
+            if data is not None:
+                self.hits += 1
+                self._unspill(key)
+                self.put(key, data)
+                return data
+        self.misses += 1
+        return None
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        self.entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            evicted_key, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self._spill(evicted_key, evicted)
+
+    def _spill(self, key, data):
+        if not self.spill_dir or key in self.spilled or len(data) > self.spill_max_bytes:
+            return
+        try:
+            with open(self._spill_path(key), "wb") as f:
+                f.write(data)
+        except OSError as e:
+            logger.warning("Could not spill report %s to disk: %s", key, e)
+            return
+        self.spilled[key] = len(data)
+        self.spilled_size += len(data)
+        self._trim_spilled()
+
+    def _unspill(self, key):
+        self.spilled_size -= self.spilled.pop(key, 0)
+        try:
+            os.remove(self._spill_path(key))
+        except OSError:
+            # Already taken by another worker sharing the directory.
+            pass
+
+    def _trim_spilled(self):
+        while self.spilled_size > self.spill_max_bytes:
+            self._unspill(next(iter(self.spilled)))
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "spilledEntries": len(self.spilled),
+            "spilledBytes": self.spilled_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+report_cache = ReportCache(REPORT_CACHE_MAX_BYTES, REPORT_CACHE_DIR)
+_executor = None
+_in_flight = {}
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        if REPORT_EXECUTOR == "thread":
+            _executor = ThreadPoolExecutor(max_workers=REPORT_WORKERS)
+        else:
+            # Forking a server that already runs threads (the event loop's
+            # executor, driver monitors) can copy held locks into the child.
+            _executor = ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def get_report(patient):
+    """Returns the PDF for a patient document, rendering it off the event loop.
+
+    Concurrent requests for the same key share one render.
+    """
+    key = report_key(patient)
+    data = report_cache.get(key)
+    if data is not None:
+        return data
+
+    future = _in_flight.get(key)
+    if future is None:
+        fields = {field: patient[field] for field in REPORT_FIELDS if field in patient}
+        started = time.perf_counter()
+        future = asyncio.get_running_loop().run_in_executor(_get_executor(), render_report, fields)
+        _in_flight[key] = future
+
+        def finished(f):
+            _in_flight.pop(key, None)
+            REPORT_RENDER_LATENCY.observe(time.perf_counter() - started)
+            if not f.cancelled() and f.exception() is None:
+                report_cache.put(key, f.result())
+
+        future.add_done_callback(finished)
+    # Shielded so a client disconnecting does not cancel a render that other
+    # requests are waiting on.
+    return await asyncio.shield(future)
+
+
+async def stream_reports_zip(patients):
+    """Yields a ZIP of reports for an async iterable of patient documents.
+
+    Up to ZIP_MAX_IN_FLIGHT reports render at once; each is added to the
+    archive and flushed to the client as soon as it is ready.
+    """
+    buffer = ChunkSink()
+    pending = set()
+
+    async def render(patient):
+        return report_filename(patient), await get_report(patient)
+
+    def add(done):
+        for task in done:
+            filename, data = task.result()
+            archive.writestr(filename, data)
+
+    try:
+        # PDFs are already compressed, so entries are stored as-is.
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+            async for patient in patients:
+                pending.add(asyncio.ensure_future(render(patient)))
+                if len(pending) >= ZIP_MAX_IN_FLIGHT:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    add(done)
+                    yield buffer.drain()
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                add(done)
+                yield buffer.drain()
+        yield buffer.drain()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from pymongo import UpdateOne
+from starlette.concurrency import run_in_threadpool
+
+from services.risk_assessment import RISK_METADATA_FIELDS, RULES_VERSION, SCORE_FIELDS, SCORE_INPUT_FIELDS, score_changes
+from services.risk_batch import score_batch
+from services.http_cache import bump_collection_version
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def stale_patients_query():
+    """Matches patients scored by older rules or whose age band has since changed."""
+    today = datetime.utcnow().date().isoformat()
+    return {"$or": [
+        {"riskRulesVersion": {"$ne": RULES_VERSION}},
+        {"riskReviewDate": {"$lte": today}},
+    ]}
+
+
+def scored_version_filter(document):
+    """Matches ``document`` only while it is still the version that was scored."""
+    guard = {"_id": document["_id"], "lastModified": document.get("lastModified")}
+    guard.update({field: document.get(field) for field in RISK_METADATA_FIELDS})
+    return guard
+
+
+async def _flush(db, chunk, stats):
+    # Scoring a chunk is CPU-bound; off the event loop it does not stall
+    # requests served by the same worker.
+    results = await run_in_threadpool(score_batch, chunk)
+    # Written only over the version that was scored, so a PUT or PATCH that
+    # landed after the read keeps its own scores.
+    operations = [
+        UpdateOne(scored_version_filter(document), {"$set": scores})
+        for document, scores in zip(chunk, results)
+        if score_changes(document, scores)
+    ]
+    stats["scanned"] += len(chunk)
+    if operations:
+        result = await db.patients.bulk_write(operations, ordered=False)
+        stats["updated"] += result.modified_count
+        await bump_collection_version(db, "patients")
+
+
+async def rescore_patients(db, chunk_size=DEFAULT_CHUNK_SIZE, query=None):
+    """Recomputes stored risk scores for every patient matching ``query``.
+
+    Documents are streamed from the cursor with only the score inputs and
+    outputs projected, scored a chunk at a time with the batch engine, and only
+    documents whose scores actually changed are written back.
+    """
+    projection = {field: 1 for field in SCORE_INPUT_FIELDS + SCORE_FIELDS + RISK_METADATA_FIELDS + ["lastModified"]}
+    cursor = db.patients.find(query or {}, projection, batch_size=chunk_size)
+    stats = {"scanned": 0, "updated": 0}
+    chunk = []
+    async for document in cursor:
+        chunk.append(document)
+        if len(chunk) >= chunk_size:
+            await _flush(db, chunk, stats)
+            chunk = []
+    if chunk:
+        await _flush(db, chunk, stats)
+    logger.info("Rescored patients: %(scanned)d scanned, %(updated)d updated", stats)
+    return stats
+
+
+async def _main():
+    from db import get_database
+    db = await get_database()
+    stats = await rescore_patients(db)
+    print(f"Rescored patients: {stats['scanned']} scanned, {stats['updated']} updated")
+
+
+if __name__ == "__main__":
+    # Run from the backend directory: python -m services.rescore
+    asyncio.run(_main())
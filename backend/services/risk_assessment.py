@@ -1,4 +1,209 @@
+import hashlib
+import os
+from collections import OrderedDict, namedtuple
 from datetime import datetime
+from services.metrics import RISK_ASSESSMENT_LATENCY
+
+# Bump whenever a rule, keyword or threshold below changes, or a field is added
+# to score_metadata. Stored scores from an older version are recomputed the
+# next time the patient is read.
+RULES_VERSION = 2
+
+# The only part of a patient's age the rules look at.
+AGE_THRESHOLD = 50
+
+# Every keyword rule used by assess_risk, grouped by the patient field it is
+# matched against. Each rule becomes one bit of the feature bitset produced by
+# extract_features, which every score below reads instead of re-scanning the
+# patient's lists once per rule.
+CONDITIONS = {
+    'medicalHistory': {
+        'asa_2': ['hypertension', 'diabetes', 'obesity', 'smoker', 'alcohol'],
+        'asa_3': ['poorly controlled hypertension', 'poorly controlled diabetes', 'stable angina', 'prior mi', 'prior cva', 'morbid obesity', 'chronic renal failure', 'moderate copd', 'asthma'],
+        'asa_4': ['unstable angina', 'severe copd', 'chf', 'recent mi', 'recent cva', 'end-stage renal disease'],
+        'snoring': ['snoring', 'sleep apnea', 'osa'],
+        'tiredness': ['tiredness', 'fatigue', 'sleepy', 'sleep apnea'],
+        'observed_apnea': ['observed apnea', 'sleep apnea', 'osa'],
+        'high_blood_pressure': ['hypertension', 'high blood pressure'],
+        'morbid_obesity': ['morbid obesity'],
+        'ischemic_heart_disease': ['ischemic heart disease', 'mi', 'angina', 'cad'],
+        'heart_failure': ['congestive heart failure', 'chf'],
+        'cerebrovascular_disease': ['cerebrovascular disease', 'cva', 'tia'],
+        'mets_poor': ['chf', 'severe copd', 'unstable angina', 'end-stage renal disease'],
+        'mets_limited': ['moderate copd', 'stable angina', 'prior mi', 'prior cva'],
+        'osa': ['obstructive sleep apnea', 'osa'],
+        'uncontrolled_hypertension': ['uncontrolled hypertension', 'hypertensive crisis'],
+        'uncontrolled_diabetes': ['uncontrolled diabetes', 'diabetic ketoacidosis'],
+        'recent_mi_cva': ['recent mi', 'recent cva'],
+        'pregnancy': ['pregnancy'],
+        'hypertension_or_diabetes': ['hypertension', 'diabetes'],
+        'anemia': ['anemia', 'bleeding disorder'],
+        'diabetes': ['diabetes'],
+        'renal_liver_electrolyte': ['renal failure', 'liver disease', 'electrolyte imbalance'],
+    },
+    'medications': {
+        'insulin': ['insulin'],
+        'anticoagulants': ['warfarin', 'heparin', 'rivaroxaban', 'apixaban', 'dabigatran', 'edoxaban'],
+    },
+    'allergies': {
+        'severe_allergy': ['anaphylaxis', 'severe allergy'],
+    },
+}
+
+# Patient fields assess_risk reads, and the fields it produces.
+SCORE_INPUT_FIELDS = ['medicalHistory', 'medications', 'allergies', 'surgicalHistory', 'mallampatiScore', 'dateOfBirth']
+SCORE_FIELDS = ['asaScore', 'stopBangScore', 'rcriScore', 'metsScore', 'riskCategory', 'criticalAlerts', 'preOpRecommendations']
+# Stored next to the scores: what to find stale ones by, and the rank lists
+# sort riskCategory by.
+RISK_METADATA_FIELDS = ['riskRulesVersion', 'riskFingerprint', 'riskReviewDate', 'riskSeverity']
+RISK_SEVERITY = {'Low': 1, 'Moderate': 2, 'High': 3}
+
+FEATURE_BITS = {}
+for _rules in CONDITIONS.values():
+    for _name in _rules:
+        FEATURE_BITS[_name] = 1 << len(FEATURE_BITS)
+# Keeps the bitset representable as a uint64 column in the batch engine.
+assert len(FEATURE_BITS) <= 64
+
+
+class KeywordMatcher:
+    """Finds every rule whose keywords occur as a substring of the given texts.
+
+    Keywords shared between rules are deduplicated, and each keyword's mask also
+    carries the bits of every keyword it contains, so a hit on 'sleep apnea'
+    settles 'snoring', 'tiredness' and 'observed_apnea' at once. Keywords are
+    tried longest first and skipped once all of their bits are already set.
+    """
+
+    def __init__(self, rules):
+        keyword_bits = {}
+        for name, keywords in rules.items():
+            for keyword in keywords:
+                keyword_bits[keyword] = keyword_bits.get(keyword, 0) | FEATURE_BITS[name]
+
+        self.keywords = []
+        for keyword in sorted(keyword_bits, key=len, reverse=True):
+            mask = 0
+            for other, bits in keyword_bits.items():
+                if other in keyword:
+                    mask |= bits
+            self.keywords.append((keyword, mask))
+
+    def scan(self, texts):
+        # Entries are joined with a separator no keyword contains, so the
+        # field is lowercased once and a match can never span two entries.
+        text = '\x00'.join(t.lower() for t in texts)
+        bits = 0
+        if not text:
+            return bits
+        for keyword, mask in self.keywords:
+            if mask & ~bits and keyword in text:
+                bits |= mask
+        return bits
+
+
+MATCHERS = {field: KeywordMatcher(rules) for field, rules in CONDITIONS.items()}
+
+
+def extract_features(patient):
+    features = 0
+    for field, matcher in MATCHERS.items():
+        # Stored nulls are treated as empty rather than failing a whole batch.
+        features |= matcher.scan(patient.get(field) or [])
+    return features
+
+
+def calculate_age(date_of_birth):
+    if not date_of_birth:
+        return None
+    try:
+        # Assuming date_of_birth is in ISO format 'YYYY-MM-DDTHH:MM:SS.sssZ'
+        dob = datetime.fromisoformat(date_of_birth.replace('Z', '+00:00'))
+        today = datetime.utcnow().replace(tzinfo=dob.tzinfo)
+        return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+    except (ValueError, TypeError):
+        return None # Handle cases with invalid date format
+
+
+def age_review_date(date_of_birth):
+    """Returns the ISO date on which the patient crosses AGE_THRESHOLD, if still ahead."""
+    age = calculate_age(date_of_birth)
+    if age is None or age > AGE_THRESHOLD:
+        return None
+    dob = datetime.fromisoformat(date_of_birth.replace('Z', '+00:00'))
+    year = dob.year + AGE_THRESHOLD + 1
+    try:
+        return dob.replace(year=year).date().isoformat()
+    except ValueError:
+        # Born on 29 February; the birthday counts from 1 March.
+        return dob.replace(year=year, month=3, day=1).date().isoformat()
+
+
+# Everything the rules depend on, with age reduced to the threshold it is
+# compared against so that the same inputs give the same fingerprint on any day.
+ScoreInputs = namedtuple('ScoreInputs', ['features', 'has_surgical_history', 'mallampati_score', 'over_age_threshold'])
+
+
+def score_inputs(patient):
+    age = calculate_age(patient.get('dateOfBirth'))
+    return ScoreInputs(
+        extract_features(patient),
+        bool(patient.get('surgicalHistory', [])),
+        patient.get('mallampatiScore'),
+        age is not None and age > AGE_THRESHOLD,
+    )
+
+
+def input_fingerprint(inputs):
+    return hashlib.sha1(repr(tuple(inputs)).encode()).hexdigest()
+
+
+class RiskMemo:
+    """Bounded LRU from (rules version, input fingerprint) to assessment."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+risk_memo = RiskMemo(int(os.environ.get("RISK_MEMO_SIZE", 4096)))
+
+
+def _copy(result):
+    return {key: list(value) if isinstance(value, list) else value for key, value in result.items()}
+
+
+def assess_inputs(inputs):
+    key = (RULES_VERSION, input_fingerprint(inputs))
+    result = risk_memo.get(key)
+    if result is None:
+        result = _score(inputs)
+        risk_memo.put(key, result)
+    return _copy(result)
+
 
 def assess_risk(patient):
     if not patient:
@@ -11,102 +216,119 @@ def assess_risk(patient):
             "criticalAlerts": [],
             "preOpRecommendations": [],
         }
+    with RISK_ASSESSMENT_LATENCY.time():
+        return assess_inputs(score_inputs(patient))
 
-    medical_history_lower = [h.lower() for h in patient.get('medicalHistory', [])]
-    medications_lower = [m.lower() for m in patient.get('medications', [])]
-    allergies_lower = [a.lower() for a in patient.get('allergies', [])]
-    surgical_history = patient.get('surgicalHistory', [])
-    mallampati_score = patient.get('mallampatiScore')
-    date_of_birth = patient.get('dateOfBirth')
 
-    critical_alerts = []
-    pre_op_recommendations = []
+def score_metadata(patient, inputs, risk_category):
+    """Fields stored next to the scores so stale ones can be found later."""
+    return {
+        "riskRulesVersion": RULES_VERSION,
+        "riskFingerprint": input_fingerprint(inputs),
+        "riskReviewDate": age_review_date(patient.get('dateOfBirth')),
+        "riskSeverity": RISK_SEVERITY.get(risk_category, 0),
+    }
+
+
+def score_patient(patient):
+    """assess_risk plus the version metadata persisted on patient documents."""
+    if not patient:
+        return assess_risk(patient)
+    with RISK_ASSESSMENT_LATENCY.time():
+        inputs = score_inputs(patient)
+        result = assess_inputs(inputs)
+    result.update(score_metadata(patient, inputs, result['riskCategory']))
+    return result
 
-    def has_medical_condition(keywords):
-        return any(any(keyword in history for history in medical_history_lower) for keyword in keywords)
 
-    def has_medication(keywords):
-        return any(any(keyword in med for med in medications_lower) for keyword in keywords)
+def scores_are_stale(document, today=None):
+    """True if the document's stored scores predate the current rules or age band."""
+    if document.get('riskRulesVersion') != RULES_VERSION:
+        return True
+    review_date = document.get('riskReviewDate')
+    if review_date is None:
+        return False
+    today = today or datetime.utcnow().date().isoformat()
+    return today >= review_date
 
-    def has_allergy(keywords):
-        return any(any(keyword in allergy for allergy in allergies_lower) for keyword in keywords)
 
-    age = None
-    if date_of_birth:
-        try:
-            # Assuming date_of_birth is in ISO format 'YYYY-MM-DDTHH:MM:SS.sssZ'
-            dob = datetime.fromisoformat(date_of_birth.replace('Z', '+00:00'))
-            today = datetime.utcnow().replace(tzinfo=dob.tzinfo)
-            age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
-        except (ValueError, TypeError):
-            age = None # Handle cases with invalid date format
+def _score(inputs):
+    features = inputs.features
+    surgical_history = inputs.has_surgical_history
+    mallampati_score = inputs.mallampati_score
+    over_age_threshold = inputs.over_age_threshold
 
+    critical_alerts = []
+    pre_op_recommendations = []
+
+    def has(name):
+        return bool(features & FEATURE_BITS[name])
 
     # --- ASA Score Calculation (Simplified) ---
     asa_score = 1
-    if has_medical_condition(['hypertension', 'diabetes', 'obesity', 'smoker', 'alcohol']) or surgical_history:
+    if has('asa_2') or surgical_history:
         asa_score = max(asa_score, 2)
-    if has_medical_condition(['poorly controlled hypertension', 'poorly controlled diabetes', 'stable angina', 'prior mi', 'prior cva', 'morbid obesity', 'chronic renal failure', 'moderate copd', 'asthma']):
+    if has('asa_3'):
         asa_score = max(asa_score, 3)
-    if has_medical_condition(['unstable angina', 'severe copd', 'chf', 'recent mi', 'recent cva', 'end-stage renal disease']):
+    if has('asa_4'):
         asa_score = max(asa_score, 4)
 
     # --- STOP-Bang Score Calculation (Simplified) ---
     stop_bang_score = 0
-    if has_medical_condition(['snoring', 'sleep apnea', 'osa']): stop_bang_score += 1
-    if has_medical_condition(['tiredness', 'fatigue', 'sleepy', 'sleep apnea']): stop_bang_score += 1
-    if has_medical_condition(['observed apnea', 'sleep apnea', 'osa']): stop_bang_score += 1
-    if has_medical_condition(['hypertension', 'high blood pressure']): stop_bang_score += 1
-    if has_medical_condition(['morbid obesity']): stop_bang_score += 1
-    if age is not None and age > 50: stop_bang_score += 1
+    if has('snoring'): stop_bang_score += 1
+    if has('tiredness'): stop_bang_score += 1
+    if has('observed_apnea'): stop_bang_score += 1
+    if has('high_blood_pressure'): stop_bang_score += 1
+    if has('morbid_obesity'): stop_bang_score += 1
+    if over_age_threshold: stop_bang_score += 1
 
     # --- RCRI Score Calculation (Simplified) ---
     rcri_score = 0
-    if has_medical_condition(['ischemic heart disease', 'mi', 'angina', 'cad']): rcri_score += 1
-    if has_medical_condition(['congestive heart failure', 'chf']): rcri_score += 1
-    if has_medical_condition(['cerebrovascular disease', 'cva', 'tia']): rcri_score += 1
-    if has_medication(['insulin']): rcri_score += 1
+    if has('ischemic_heart_disease'): rcri_score += 1
+    if has('heart_failure'): rcri_score += 1
+    if has('cerebrovascular_disease'): rcri_score += 1
+    if has('insulin'): rcri_score += 1
 
     # --- METs Score Calculation (Simplified) ---
     mets_score = 4
-    if has_medical_condition(['chf', 'severe copd', 'unstable angina', 'end-stage renal disease']):
+    if has('mets_poor'):
         mets_score = 0
-    elif has_medical_condition(['moderate copd', 'stable angina', 'prior mi', 'prior cva']):
+    elif has('mets_limited'):
         mets_score = 2
 
     # --- Critical Alerts ---
-    if has_medication(['warfarin', 'heparin', 'rivaroxaban', 'apixaban', 'dabigatran', 'edoxaban']):
+    if has('anticoagulants'):
         critical_alerts.append('Active anticoagulants')
         pre_op_recommendations.append('INR/PTT check')
-    if has_allergy(['anaphylaxis', 'severe allergy']):
+    if has('severe_allergy'):
         critical_alerts.append('Severe allergies')
-    if stop_bang_score >= 3 or has_medical_condition(['obstructive sleep apnea', 'osa']):
+    if stop_bang_score >= 3 or has('osa'):
         critical_alerts.append('Diagnosed Obstructive Sleep Apnea (OSA)')
         if 'Sleep Study (if not recent)' not in pre_op_recommendations:
             pre_op_recommendations.append('Sleep Study (if not recent)')
     if mallampati_score and mallampati_score >= 3:
         critical_alerts.append(f'Significant airway issue (Mallampati Score {mallampati_score})')
-    if has_medical_condition(['uncontrolled hypertension', 'hypertensive crisis']):
+    if has('uncontrolled_hypertension'):
         critical_alerts.append('Uncontrolled Hypertension')
         pre_op_recommendations.append('BP optimization')
-    if has_medical_condition(['uncontrolled diabetes', 'diabetic ketoacidosis']):
+    if has('uncontrolled_diabetes'):
         critical_alerts.append('Uncontrolled Diabetes')
         pre_op_recommendations.append('HbA1c, Glucose optimization')
-    if has_medical_condition(['recent mi', 'recent cva']):
+    if has('recent_mi_cva'):
         critical_alerts.append('Recent MI/CVA')
         pre_op_recommendations.append('Cardiac/Neurology consult')
-    if has_medical_condition(['pregnancy']):
+    if has('pregnancy'):
         critical_alerts.append('Patient is pregnant')
         pre_op_recommendations.append('OB clearance')
 
     # --- Pre-operative Recommendations (General) ---
-    if asa_score >= 3 or rcri_score >= 1 or (age is not None and age > 50 and has_medical_condition(['hypertension', 'diabetes'])):
+    if asa_score >= 3 or rcri_score >= 1 or (over_age_threshold and has('hypertension_or_diabetes')):
         if 'EKG' not in pre_op_recommendations: pre_op_recommendations.append('EKG')
-    if has_medical_condition(['anemia', 'bleeding disorder']):
+    if has('anemia'):
         if 'CBC' not in pre_op_recommendations: pre_op_recommendations.append('CBC')
-    if has_medical_condition(['diabetes']):
+    if has('diabetes'):
         if 'HbA1c' not in pre_op_recommendations: pre_op_recommendations.append('HbA1c')
-    if has_medical_condition(['renal failure', 'liver disease', 'electrolyte imbalance']):
+    if has('renal_liver_electrolyte'):
         if 'CMP' not in pre_op_recommendations: pre_op_recommendations.append('CMP')
 
     # --- Risk Category Determination ---
@@ -124,4 +346,20 @@ def assess_risk(patient):
         "riskCategory": risk_category,
         "criticalAlerts": list(set(critical_alerts)),
         "preOpRecommendations": list(set(pre_op_recommendations)),
-    }
\ No newline at end of file
+    }
+
+
+def score_changes(document, scores):
+    """Returns the entries of ``scores`` that differ from those stored on ``document``.
+
+    Alert and recommendation lists are unordered, so they compare as sets.
+    """
+    changes = {}
+    for field, new in scores.items():
+        old = document.get(field)
+        if isinstance(new, list):
+            if set(old or []) != set(new):
+                changes[field] = new
+        elif old != new:
+            changes[field] = new
+    return changes
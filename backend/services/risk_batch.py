@@ -0,0 +1,225 @@
+from collections import namedtuple
+
+import numpy as np
+
+from services.risk_assessment import AGE_THRESHOLD, FEATURE_BITS, ScoreInputs, assess_risk, calculate_age, extract_features, score_metadata
+
+RISK_CATEGORIES = np.array([None, 'Low', 'Moderate', 'High'], dtype=object)
+
+# Alerts and recommendations in the order assess_risk emits them. Each entry
+# is a bit in the per-patient alert/recommendation masks built below.
+ALERTS = [
+    'Active anticoagulants',
+    'Severe allergies',
+    'Diagnosed Obstructive Sleep Apnea (OSA)',
+    'Significant airway issue',
+    'Uncontrolled Hypertension',
+    'Uncontrolled Diabetes',
+    'Recent MI/CVA',
+    'Patient is pregnant',
+]
+RECOMMENDATIONS = [
+    'INR/PTT check',
+    'Sleep Study (if not recent)',
+    'BP optimization',
+    'HbA1c, Glucose optimization',
+    'Cardiac/Neurology consult',
+    'OB clearance',
+    'EKG',
+    'CBC',
+    'HbA1c',
+    'CMP',
+]
+AIRWAY_ALERT = 1 << ALERTS.index('Significant airway issue')
+
+# Cutoffs score_matrix applies. The defaults are the ones hard-coded in
+# risk_assessment._score; other values are only used for what-if evaluation
+# (services.cohort). The *_mets cutoffs are exclusive: METs below them count.
+RuleThresholds = namedtuple('RuleThresholds', [
+    'age_threshold',
+    'osa_stop_bang',
+    'airway_mallampati',
+    'high_asa', 'high_stop_bang', 'high_rcri', 'high_mets',
+    'moderate_asa', 'moderate_stop_bang', 'moderate_rcri', 'moderate_mets',
+])
+DEFAULT_THRESHOLDS = RuleThresholds(
+    age_threshold=AGE_THRESHOLD,
+    osa_stop_bang=3,
+    airway_mallampati=3,
+    high_asa=4, high_stop_bang=5, high_rcri=3, high_mets=2,
+    moderate_asa=3, moderate_stop_bang=3, moderate_rcri=1, moderate_mets=4,
+)
+
+
+class FeatureMatrix:
+    """Column-oriented score inputs for a batch of patients."""
+
+    def __init__(self, features, ages, mallampati, surgical, valid):
+        self.features = features
+        self.ages = ages
+        self.mallampati = mallampati
+        self.surgical = surgical
+        self.valid = valid
+
+    def __len__(self):
+        return len(self.features)
+
+    def has(self, name):
+        return (self.features & np.uint64(FEATURE_BITS[name])) != 0
+
+
+def build_feature_matrix(patients):
+    # Keyword matching and date parsing are per-record string work; everything
+    # after this point operates on whole columns.
+    count = len(patients)
+    features = np.zeros(count, dtype=np.uint64)
+    ages = np.full(count, -1, dtype=np.int16)
+    mallampati = np.zeros(count, dtype=np.int16)
+    surgical = np.zeros(count, dtype=bool)
+    valid = np.zeros(count, dtype=bool)
+    for i, patient in enumerate(patients):
+        if not patient:
+            continue
+        valid[i] = True
+        features[i] = extract_features(patient)
+        age = calculate_age(patient.get('dateOfBirth'))
+        if age is not None:
+            ages[i] = age
+        mallampati[i] = patient.get('mallampatiScore') or 0
+        surgical[i] = bool(patient.get('surgicalHistory', []))
+    return FeatureMatrix(features, ages, mallampati, surgical, valid)
+
+
+def _mask(columns):
+    mask = np.zeros(len(columns[0]), dtype=np.int64)
+    for bit, column in enumerate(columns):
+        mask |= column.astype(np.int64) << bit
+    return mask
+
+
+def score_matrix(matrix, thresholds=DEFAULT_THRESHOLDS):
+    """Vectorized equivalent of assess_risk over a FeatureMatrix.
+
+    Returns a dict of columns: the four scores, the risk category index into
+    RISK_CATEGORIES, and bit masks over ALERTS and RECOMMENDATIONS.
+    """
+    has = matrix.has
+    t = thresholds
+    over_age = matrix.ages > t.age_threshold
+
+    asa = np.ones(len(matrix), dtype=np.int8)
+    asa[has('asa_2') | matrix.surgical] = 2
+    asa[has('asa_3')] = 3
+    asa[has('asa_4')] = 4
+
+    stop_bang = (
+        has('snoring').astype(np.int8) + has('tiredness') + has('observed_apnea')
+        + has('high_blood_pressure') + has('morbid_obesity') + over_age
+    )
+    rcri = (
+        has('ischemic_heart_disease').astype(np.int8) + has('heart_failure')
+        + has('cerebrovascular_disease') + has('insulin')
+    )
+    mets = np.where(has('mets_poor'), 0, np.where(has('mets_limited'), 2, 4)).astype(np.int8)
+
+    anticoagulants = has('anticoagulants')
+    osa = (stop_bang >= t.osa_stop_bang) | has('osa')
+    uncontrolled_hypertension = has('uncontrolled_hypertension')
+    uncontrolled_diabetes = has('uncontrolled_diabetes')
+    recent_mi_cva = has('recent_mi_cva')
+    pregnancy = has('pregnancy')
+    alerts = _mask([
+        anticoagulants,
+        has('severe_allergy'),
+        osa,
+        matrix.mallampati >= t.airway_mallampati,
+        uncontrolled_hypertension,
+        uncontrolled_diabetes,
+        recent_mi_cva,
+        pregnancy,
+    ])
+    recommendations = _mask([
+        anticoagulants,
+        osa,
+        uncontrolled_hypertension,
+        uncontrolled_diabetes,
+        recent_mi_cva,
+        pregnancy,
+        (asa >= 3) | (rcri >= 1) | (over_age & has('hypertension_or_diabetes')),
+        has('anemia'),
+        has('diabetes'),
+        has('renal_liver_electrolyte'),
+    ])
+
+    high = (
+        (asa >= t.high_asa) | (alerts != 0) | (stop_bang >= t.high_stop_bang)
+        | (rcri >= t.high_rcri) | (mets < t.high_mets)
+    )
+    moderate = (
+        (asa >= t.moderate_asa) | (stop_bang >= t.moderate_stop_bang)
+        | (rcri >= t.moderate_rcri) | (mets < t.moderate_mets)
+    )
+    category = np.where(high, 3, np.where(moderate, 2, 1)).astype(np.int8)
+    category[~matrix.valid] = 0
+
+    return {
+        'asaScore': asa,
+        'stopBangScore': stop_bang,
+        'rcriScore': rcri,
+        'metsScore': mets,
+        'riskCategory': category,
+        'criticalAlerts': alerts,
+        'preOpRecommendations': recommendations,
+    }
+
+
+def _labels(mask, names, cache):
+    labels = cache.get(mask)
+    if labels is None:
+        labels = [name for bit, name in enumerate(names) if mask & (1 << bit)]
+        cache[mask] = labels
+    return list(labels)
+
+
+def score_batch(patients):
+    """Scores many patients at once; results match score_patient per patient."""
+    if not patients:
+        return []
+    matrix = build_feature_matrix(patients)
+    columns = score_matrix(matrix)
+
+    asa = columns['asaScore'].tolist()
+    stop_bang = columns['stopBangScore'].tolist()
+    rcri = columns['rcriScore'].tolist()
+    mets = columns['metsScore'].tolist()
+    categories = RISK_CATEGORIES[columns['riskCategory']].tolist()
+    alerts = columns['criticalAlerts'].tolist()
+    recommendations = columns['preOpRecommendations'].tolist()
+    mallampati = matrix.mallampati.tolist()
+    valid = matrix.valid.tolist()
+    features = matrix.features.tolist()
+    surgical = matrix.surgical.tolist()
+    over_age_threshold = (matrix.ages > AGE_THRESHOLD).tolist()
+
+    alert_cache, recommendation_cache = {}, {}
+    results = []
+    for i in range(len(patients)):
+        if not valid[i]:
+            results.append(assess_risk(None))
+            continue
+        critical_alerts = _labels(alerts[i], ALERTS, alert_cache)
+        if alerts[i] & AIRWAY_ALERT:
+            index = critical_alerts.index('Significant airway issue')
+            critical_alerts[index] = f'Significant airway issue (Mallampati Score {mallampati[i]})'
+        inputs = ScoreInputs(features[i], surgical[i], patients[i].get('mallampatiScore'), over_age_threshold[i])
+        results.append({
+            "asaScore": asa[i],
+            "stopBangScore": stop_bang[i],
+            "rcriScore": rcri[i],
+            "metsScore": mets[i],
+            "riskCategory": categories[i],
+            "criticalAlerts": critical_alerts,
+            "preOpRecommendations": _labels(recommendations[i], RECOMMENDATIONS, recommendation_cache),
+            **score_metadata(patients[i], inputs, categories[i]),
+        })
+    return results
@@ -0,0 +1,77 @@
+import io
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content):
+    return orjson.dumps(content, default=_default)
+
+
+class ChunkSink(io.RawIOBase):
+    """Unseekable file that collects writes until they are drained.
+
+    Lets a writer that expects a file (zipfile, pyarrow) be streamed a piece
+    at a time; being unseekable makes zipfile write data descriptors.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class ORJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content)
+
+
+class DocumentView:
+    """Renders stored Mongo documents in the shape of a Pydantic output model.
+
+    Documents were validated when they were written, so reads skip model
+    construction entirely: each document is copied field by field (with the
+    model's defaults for missing fields) and handed straight to orjson. The
+    model is still declared as ``response_model`` for the OpenAPI schema.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.fields = [
+            (name, field.get_default(call_default_factory=True))
+            for name, field in model.model_fields.items()
+            if name != "id"
+        ]
+        self.projection = {name: 1 for name, _ in self.fields}
+
+    def render(self, document):
+        rendered = {"id": str(document["_id"])}
+        for name, default in self.fields:
+            value = document.get(name, default)
+            rendered[name] = list(value) if isinstance(value, list) else value
+        return rendered
+
+    def render_many(self, documents):
+        return [self.render(document) for document in documents]
+
+    def response(self, document, **kwargs):
+        return ORJSONResponse(self.render(document), **kwargs)
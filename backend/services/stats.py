@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import os
+from collections import Counter
+from datetime import datetime
+
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+STATS_FLUSH_INTERVAL = float(os.environ.get("STATS_FLUSH_INTERVAL", 1.0))
+STATS_RECONCILE_INTERVAL = float(os.environ.get("STATS_RECONCILE_INTERVAL", 3600))
+
+ROLLUP_ID = "patients"
+UNKNOWN = "unknown"
+
+# Rollup keys are alert and recommendation texts, which must not contain the
+# characters MongoDB reads as path separators or operators.
+_ESCAPES = [(".", "．"), ("$", "＄")]
+
+
+def _escape(key):
+    key = UNKNOWN if key is None else str(key)
+    for char, replacement in _ESCAPES:
+        key = key.replace(char, replacement)
+    return key
+
+
+def _unescape(key):
+    for char, replacement in _ESCAPES:
+        key = key.replace(replacement, char)
+    return key
+
+
+def patient_counts(patient):
+    """The rollup counters a single patient document contributes to."""
+    counts = Counter()
+    if not patient:
+        return counts
+    counts["total"] = 1
+    counts[f"riskCategory.{_escape(patient.get('riskCategory'))}"] = 1
+    counts[f"asaScore.{_escape(patient.get('asaScore'))}"] = 1
+    for alert in set(patient.get("criticalAlerts") or []):
+        counts[f"criticalAlerts.{_escape(alert)}"] = 1
+    completed = set(patient.get("completedRecommendations") or [])
+    for recommendation in set(patient.get("preOpRecommendations") or []):
+        state = "completed" if recommendation in completed else "outstanding"
+        counts[f"recommendations.{_escape(recommendation)}.{state}"] = 1
+    return counts
+
+
+def rollup_delta(before, after):
+    delta = Counter(patient_counts(after))
+    delta.subtract(patient_counts(before))
+    return {path: n for path, n in delta.items() if n}
+
+
+ROLLUP_PIPELINE = [
+    {"$facet": {
+        "total": [{"$count": "n"}],
+        "riskCategory": [{"$group": {"_id": "$riskCategory", "n": {"$sum": 1}}}],
+        "asaScore": [{"$group": {"_id": "$asaScore", "n": {"$sum": 1}}}],
+        "criticalAlerts": [
+            {"$unwind": "$criticalAlerts"},
+            {"$group": {"_id": "$criticalAlerts", "n": {"$sum": 1}}},
+        ],
+        "recommendations": [
+            {"$project": {"preOpRecommendations": 1, "completed": {"$ifNull": ["$completedRecommendations", []]}}},
+            {"$unwind": "$preOpRecommendations"},
+            {"$group": {
+                "_id": {
+                    "name": "$preOpRecommendations",
+                    "completed": {"$in": ["$preOpRecommendations", "$completed"]},
+                },
+                "n": {"$sum": 1},
+            }},
+        ],
+    }},
+]
+
+
+async def compute_rollup(db):
+    """Builds the rollup from scratch with an aggregation over all patients."""
+    facets = (await db.patients.aggregate(ROLLUP_PIPELINE).to_list(1))[0]
+    rollup = {
+        "total": facets["total"][0]["n"] if facets["total"] else 0,
+        "riskCategory": {_escape(group["_id"]): group["n"] for group in facets["riskCategory"]},
+        "asaScore": {_escape(group["_id"]): group["n"] for group in facets["asaScore"]},
+        "criticalAlerts": {_escape(group["_id"]): group["n"] for group in facets["criticalAlerts"]},
+        "recommendations": {},
+    }
+    for group in facets["recommendations"]:
+        name = _escape(group["_id"]["name"])
+        state = "completed" if group["_id"]["completed"] else "outstanding"
+        rollup["recommendations"].setdefault(name, {"outstanding": 0, "completed": 0})[state] = group["n"]
+    return rollup
+
+
+class StatsRollup:
+    """Dashboard counters kept in one ``patient_stats`` document.
+
+    Patient writes hand their before/after documents to ``record``; the
+    counter deltas are summed in process and applied with a single ``$inc``
+    every ``flush_interval`` seconds, so the request path never waits on the
+    rollup. Every ``reconcile_interval`` seconds the document is rebuilt from
+    an aggregation to correct drift from writes that bypass ``record``
+    (bulk rescoring, Truform ingestion) or from races between workers.
+    Without a running flusher, deltas are applied immediately.
+    """
+
+    def __init__(self, flush_interval=STATS_FLUSH_INTERVAL, reconcile_interval=STATS_RECONCILE_INTERVAL):
+        self.flush_interval = flush_interval
+        self.reconcile_interval = reconcile_interval
+        self.pending = {}
+        self.task = None
+        self.lock = None
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    def start(self, db):
+        self.lock = asyncio.Lock()
+        self.task = asyncio.create_task(self._run(db))
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+        for db, _ in list(self.pending.values()):
+            await self.flush(db)
+
+    async def record(self, db, before, after):
+        delta = rollup_delta(before, after)
+        if not delta:
+            return
+        self._pending(db).update(delta)
+        if not self.running:
+            await self.flush(db)
+
+    def _pending(self, db):
+        # Keyed by id() since database handles are not hashable.
+        return self.pending.setdefault(id(db), (db, Counter()))[1]
+
+    async def flush(self, db):
+        _, pending = self.pending.pop(id(db), (db, Counter()))
+        delta = {path: n for path, n in pending.items() if n}
+        if not delta:
+            return
+        try:
+            await db.patient_stats.update_one(
+                {"_id": ROLLUP_ID},
+                {"$inc": delta, "$set": {"updatedAt": datetime.utcnow()}},
+                upsert=True,
+            )
+        except PyMongoError as e:
+            # Put the delta back; the next flush retries it.
+            self._pending(db).update(delta)
+            logger.error("Could not update patient stats: %s", e)
+
+    async def reconcile(self, db):
+        """Replaces the stored rollup with a freshly aggregated one."""
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            # Deltas already reflected in the aggregation must not be applied
+            # on top of it.
+            self.pending.pop(id(db), None)
+            rollup = await compute_rollup(db)
+            now = datetime.utcnow()
+            await db.patient_stats.replace_one(
+                {"_id": ROLLUP_ID},
+                {**rollup, "updatedAt": now, "reconciledAt": now},
+                upsert=True,
+            )
+        return rollup
+
+    async def _run(self, db):
+        loop = asyncio.get_running_loop()
+        next_reconcile = loop.time() + self.reconcile_interval
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                async with self.lock:
+                    for pending_db, _ in list(self.pending.values()):
+                        await self.flush(pending_db)
+                if loop.time() >= next_reconcile:
+                    next_reconcile = loop.time() + self.reconcile_interval
+                    await self.reconcile(db)
+            except Exception as e:
+                logger.error("Patient stats maintenance failed: %s", e)
+
+    async def read(self, db):
+        document = await db.patient_stats.find_one({"_id": ROLLUP_ID})
+        if document is None:
+            await self.reconcile(db)
+            document = await db.patient_stats.find_one({"_id": ROLLUP_ID})
+        return format_rollup(document, self.pending.get(id(db), (db, None))[1])
+
+
+def format_rollup(document, pending=None):
+    """Unescapes keys, folds in unflushed deltas and drops zero counters."""
+    document = dict(document)
+    for path, n in (pending or {}).items():
+        *parents, leaf = path.split(".")
+        node = document
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[leaf] = node.get(leaf, 0) + n
+
+    def clean(counts):
+        return {_unescape(key): n for key, n in counts.items() if n}
+
+    recommendations = {}
+    for name, states in document.get("recommendations", {}).items():
+        if any(states.values()):
+            recommendations[_unescape(name)] = {
+                "outstanding": states.get("outstanding", 0),
+                "completed": states.get("completed", 0),
+            }
+    return {
+        "total": document.get("total", 0),
+        "riskCategory": clean(document.get("riskCategory", {})),
+        "asaScore": clean(document.get("asaScore", {})),
+        "criticalAlerts": clean(document.get("criticalAlerts", {})),
+        "recommendations": recommendations,
+        "updatedAt": document.get("updatedAt"),
+        "reconciledAt": document.get("reconciledAt"),
+    }
+
+
+stats_rollup = StatsRollup()
@@ -0,0 +1,84 @@
+"""Synthetic patient records for benchmarks and the local Truform stand-in.
+
+Frequencies are rough pre-op clinic prevalences: most patients have a short
+history dominated by hypertension, diabetes and obesity, with a long tail of
+cardiac, respiratory and renal conditions.
+"""
+import random
+from datetime import date, timedelta
+
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn", "Maria", "Wei", "Amir", "Priya", "Olu"]
+LAST_NAMES = ["Smith", "Garcia", "Nguyen", "Patel", "Okafor", "Kim", "Müller", "Rossi", "Cohen", "Silva", "Brown", "Ivanova"]
+
+# (entry, weight)
+MEDICAL_HISTORY = [
+    ("Hypertension", 30), ("Type 2 diabetes", 15), ("Obesity", 12), ("Smoker, 20 pack-years", 8),
+    ("Asthma", 8), ("Hyperlipidemia", 12), ("GERD", 10), ("Hypothyroidism", 6), ("Depression", 7),
+    ("Obstructive sleep apnea on CPAP", 5), ("Snoring reported by partner", 6), ("Daytime fatigue", 5),
+    ("Stable angina", 3), ("Prior MI (2015)", 2), ("CHF, EF 35%", 2), ("Moderate COPD", 3),
+    ("Severe COPD on home O2", 1), ("Chronic renal failure stage 3", 2), ("End-stage renal disease on dialysis", 1),
+    ("Prior CVA with residual weakness", 1), ("TIA", 1), ("Atrial fibrillation", 3), ("Anemia", 4),
+    ("Bleeding disorder (von Willebrand)", 1), ("Liver disease", 1), ("Poorly controlled hypertension", 2),
+    ("Uncontrolled diabetes, HbA1c 10.2", 1), ("Morbid obesity, BMI 44", 2), ("Pregnancy, 2nd trimester", 1),
+    ("Osteoarthritis", 8), ("Migraine", 4), ("Anxiety", 5),
+]
+MEDICATIONS = [
+    ("Lisinopril 10mg", 20), ("Metformin 500mg", 14), ("Atorvastatin 40mg", 15), ("Amlodipine 5mg", 10),
+    ("Omeprazole 20mg", 10), ("Levothyroxine 50mcg", 6), ("Albuterol inhaler", 7), ("Insulin glargine", 4),
+    ("Warfarin 5mg", 2), ("Apixaban 5mg", 3), ("Rivaroxaban 20mg", 1), ("Aspirin 81mg", 12),
+    ("Sertraline 50mg", 5), ("Metoprolol 25mg", 8), ("Furosemide 40mg", 3), ("Gabapentin 300mg", 4),
+]
+ALLERGIES = [
+    ("Penicillin (rash)", 10), ("Sulfa drugs", 4), ("Latex", 3), ("Peanuts - anaphylaxis", 1),
+    ("Shellfish", 2), ("Codeine (nausea)", 3), ("Severe allergy to contrast", 1),
+]
+SURGICAL_HISTORY = [
+    ("Appendectomy", 6), ("Cholecystectomy", 6), ("C-section", 4), ("Knee arthroscopy", 4),
+    ("Hernia repair", 4), ("Tonsillectomy", 5), ("CABG", 1), ("Hip replacement", 2),
+]
+
+
+def _pick(rng, table, count):
+    entries, weights = zip(*table)
+    chosen = []
+    for _ in range(count):
+        entry = rng.choices(entries, weights)[0]
+        if entry not in chosen:
+            chosen.append(entry)
+    return chosen
+
+
+def _count(rng, mean):
+    # Geometric-ish: many short lists, a few long ones.
+    count = 0
+    while rng.random() < mean / (mean + 1):
+        count += 1
+    return count
+
+
+def make_patient(rng, history_length=None):
+    """Builds one patient as submitted to POST /patients (no computed fields)."""
+    age = rng.randint(18, 92)
+    dob = date.today() - timedelta(days=age * 365 + rng.randint(0, 364))
+    if history_length is None:
+        medical_history = _pick(rng, MEDICAL_HISTORY, _count(rng, 1.5 + age / 30))
+    else:
+        medical_history = _pick(rng, MEDICAL_HISTORY, history_length)
+        while len(medical_history) < history_length:
+            medical_history.append(f"{rng.choice(MEDICAL_HISTORY)[0]} (noted {len(medical_history)})")
+    return {
+        "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        "dateOfBirth": dob.isoformat(),
+        "medicalHistory": medical_history,
+        "medications": _pick(rng, MEDICATIONS, _count(rng, 2)),
+        "allergies": _pick(rng, ALLERGIES, _count(rng, 0.3)),
+        "surgicalHistory": _pick(rng, SURGICAL_HISTORY, _count(rng, 0.6)),
+        "mallampatiScore": rng.choices([1, 2, 3, 4], [40, 35, 18, 7])[0],
+        "airwayExamFindings": rng.choice(["Normal", "Limited neck extension", "Small mouth opening", ""]),
+        "clinicianNotes": rng.choice(["", "Cleared for surgery.", "Needs anesthesia consult before scheduling."]),
+    }
+
+
+def make_patients(count, seed=0, history_length=None):
+    rng = random.Random(seed)
+    return [make_patient(rng, history_length) for _ in range(count)]
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import os
+
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from starlette.concurrency import run_in_threadpool
+
+from models.patient import Patient
+from services.http_client import request_with_retry
+from services.http_cache import bump_collection_version
+from services.risk_batch import score_batch
+
+logger = logging.getLogger(__name__)
+
+INGEST_CONCURRENCY = int(os.environ.get("TRUFORM_INGEST_CONCURRENCY", 32))
+INGEST_BATCH_SIZE = int(os.environ.get("TRUFORM_INGEST_BATCH_SIZE", 200))
+
+# Fields taken from a Truform record; anything else it carries is ignored.
+INTAKE_FIELDS = [
+    "name", "dateOfBirth", "medicalHistory", "medications", "allergies", "surgicalHistory",
+    "mallampatiScore", "airwayExamFindings", "clinicianNotes",
+]
+HISTORY_FIELDS = ["medicalHistory", "medications", "allergies", "surgicalHistory"]
+DUPLICATE_KEY = 11000
+
+
+class HttpTruformSource:
+    """Fetches records from a Truform-compatible HTTP API."""
+
+    def __init__(self, http_client, base_url):
+        self.http_client = http_client
+        self.base_url = base_url.rstrip("/")
+
+    async def fetch(self, truform_id):
+        response = await request_with_retry(self.http_client, "GET", f"{self.base_url}/truform/{truform_id}")
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    async def list_ids(self, page_size=1000):
+        ids, offset = [], 0
+        while True:
+            response = await request_with_retry(self.http_client, "GET", f"{self.base_url}/truform", params={"offset": offset, "limit": page_size})
+            response.raise_for_status()
+            page = response.json()["ids"]
+            ids.extend(page)
+            if len(page) < page_size:
+                return ids
+            offset += page_size
+
+
+def normalize_record(record):
+    """Intake fields validated as a Patient, with history entries stripped.
+
+    Comma-separated history strings are split into lists first. Raises
+    pydantic.ValidationError for a record the Patient model rejects.
+    """
+    patient = {field: record.get(field) for field in INTAKE_FIELDS if field in record}
+    for field in HISTORY_FIELDS:
+        if isinstance(patient.get(field), str):
+            patient[field] = patient[field].split(',')
+    patient = Patient.model_validate(patient).model_dump(include=set(INTAKE_FIELDS))
+    for field in HISTORY_FIELDS:
+        patient[field] = [item.strip() for item in patient[field] if item.strip()]
+    return patient
+
+
+async def _write_batch(db, batch, modified_by, modified_at, stats):
+    scores = await run_in_threadpool(score_batch, [patient for _, patient in batch])
+    documents = []
+    for (truform_id, patient), result in zip(batch, scores):
+        documents.append({
+            **patient,
+            **result,
+            "truformId": truform_id,
+            "modifiedBy": modified_by,
+            "lastModified": modified_at,
+        })
+
+    # New forms go in with one unordered insert. Forms ingested before hit the
+    # unique truformId index and are upserted instead, so re-running an
+    # ingestion never duplicates patients.
+    existing = []
+    try:
+        result = await db.patients.insert_many(documents, ordered=False)
+        stats["inserted"] += len(result.inserted_ids)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        stats["inserted"] += e.details.get("nInserted", 0)
+        for error in errors:
+            if error.get("code") == DUPLICATE_KEY:
+                existing.append(documents[error["index"]])
+            else:
+                stats["failed"].append(documents[error["index"]]["truformId"])
+                logger.error("Could not ingest Truform record %s: %s", documents[error["index"]]["truformId"], error.get("errmsg"))
+    if existing:
+        operations = []
+        for document in existing:
+            document.pop("_id", None)
+            operations.append(UpdateOne({"truformId": document["truformId"]}, {"$set": document}, upsert=True))
+        result = await db.patients.bulk_write(operations, ordered=False)
+        stats["updated"] += result.modified_count + result.upserted_count
+    await bump_collection_version(db, "patients")
+
+
+async def ingest_truform_records(db, source, truform_ids, modified_by, modified_at,
+                                 concurrency=INGEST_CONCURRENCY, batch_size=INGEST_BATCH_SIZE):
+    """Fetches, scores and stores Truform records.
+
+    ``concurrency`` fetchers pull ids from a queue. Normalized records pass
+    through a bounded queue to a single writer, so fetchers block (backpressure)
+    whenever scoring and writing fall behind. The writer scores and stores
+    ``batch_size`` records at a time.
+    """
+    stats = {"requested": len(truform_ids), "fetched": 0, "inserted": 0, "updated": 0, "missing": [], "failed": []}
+    ids = asyncio.Queue()
+    for truform_id in truform_ids:
+        ids.put_nowait(truform_id)
+    records = asyncio.Queue(maxsize=batch_size * 2)
+    done = object()
+
+    async def fetcher():
+        while True:
+            try:
+                truform_id = ids.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                record = await source.fetch(truform_id)
+            except Exception as e:
+                logger.error("Could not fetch Truform record %s: %s", truform_id, e)
+                stats["failed"].append(truform_id)
+                continue
+            if record is None:
+                stats["missing"].append(truform_id)
+                continue
+            stats["fetched"] += 1
+            try:
+                patient = normalize_record(record)
+            except ValidationError as e:
+                # Field names only; the rejected values are patient data.
+                fields = sorted({str(error["loc"][0]) for error in e.errors() if error["loc"]})
+                logger.error("Invalid Truform record %s: %s", truform_id, ", ".join(fields))
+                stats["failed"].append(truform_id)
+                continue
+            await records.put((truform_id, patient))
+
+    async def writer():
+        batch = []
+        while True:
+            item = await records.get()
+            if item is done:
+                break
+            batch.append(item)
+            if len(batch) >= batch_size:
+                await _write_batch(db, batch, modified_by, modified_at, stats)
+                batch = []
+        if batch:
+            await _write_batch(db, batch, modified_by, modified_at, stats)
+
+    writer_task = asyncio.create_task(writer())
+    fetchers = [asyncio.create_task(fetcher()) for _ in range(min(concurrency, len(truform_ids)) or 1)]
+    try:
+        fetching = asyncio.gather(*fetchers)
+        finished, _ = await asyncio.wait({fetching, writer_task}, return_when=asyncio.FIRST_COMPLETED)
+        if writer_task in finished:
+            # The writer only stops early on an error; surface it rather than
+            # leaving fetchers blocked on a full queue.
+            writer_task.result()
+        await fetching
+        await records.put(done)
+        await writer_task
+    finally:
+        for task in fetchers + [writer_task]:
+            task.cancel()
+    return stats
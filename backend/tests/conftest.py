@@ -0,0 +1,44 @@
+import os
+
+# The app reads JWT_SECRET at import; tests never check real tokens.
+os.environ.setdefault("JWT_SECRET", "test-secret")
+
+import mongomock.collection
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import db as database
+from main import app
+from services.auth_service import get_current_user
+from services.patient_cache import patient_cache
+
+TEST_USER = {"_id": "user-1", "google_id": "google-1", "name": "Test Clinician", "email": "clinician@example.com"}
+
+
+def _add_update(add_update):
+    # pymongo 4.11+ passes sort= to bulk updates, which mongomock predates.
+    def wrapper(self, *args, sort=None, **kwargs):
+        return add_update(self, *args, **kwargs)
+    return wrapper
+
+
+mongomock.collection.BulkOperationBuilder.add_update = _add_update(mongomock.collection.BulkOperationBuilder.add_update)
+
+
+@pytest.fixture
+def db():
+    patient_cache.clear()
+    return AsyncMongoMockClient()["riskscore-test"]
+
+
+@pytest.fixture
+def client(db):
+    async def get_test_database():
+        return db
+
+    app.dependency_overrides[database.get_database] = get_test_database
+    app.dependency_overrides[get_current_user] = lambda: dict(TEST_USER)
+    # Not entered as a context manager: the lifespan would connect to MongoDB.
+    yield TestClient(app)
+    app.dependency_overrides.clear()
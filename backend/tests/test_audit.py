@@ -0,0 +1,37 @@
+from services.audit import diff_documents
+
+
+def test_unchanged_documents_have_no_changes():
+    document = {"_id": 1, "name": "Pat", "medicalHistory": ["asthma"], "asaScore": 3}
+    assert diff_documents(document, dict(document)) == {}
+
+
+def test_changed_added_and_removed_fields_are_recorded():
+    before = {"name": "Pat", "clinicianNotes": "old", "mallampatiScore": 2}
+    after = {"name": "Pat", "clinicianNotes": "new", "airwayExamFindings": "Normal"}
+    assert diff_documents(before, after) == {
+        "clinicianNotes": {"before": "old", "after": "new"},
+        "airwayExamFindings": {"before": None, "after": "Normal"},
+        "mallampatiScore": {"before": 2, "after": None},
+    }
+
+
+def test_entry_metadata_is_not_a_field_change():
+    before = {"_id": 1, "lastModified": 1, "modifiedBy": "a", "name": "Pat"}
+    after = {"_id": 1, "lastModified": 2, "modifiedBy": "b", "name": "Pat"}
+    assert diff_documents(before, after) == {}
+
+
+def test_scorer_lists_compare_as_sets():
+    before = {"criticalAlerts": ["Severe allergies", "Recent MI/CVA"], "preOpRecommendations": ["EKG", "CBC"]}
+    after = {"criticalAlerts": ["Recent MI/CVA", "Severe allergies"], "preOpRecommendations": ["CBC", "EKG"]}
+    assert diff_documents(before, after) == {}
+
+    after["preOpRecommendations"] = ["EKG"]
+    assert diff_documents(before, after) == {"preOpRecommendations": {"before": ["EKG", "CBC"], "after": ["EKG"]}}
+
+
+def test_clinician_entered_lists_keep_their_order():
+    before = {"medicalHistory": ["asthma", "diabetes"]}
+    after = {"medicalHistory": ["diabetes", "asthma"]}
+    assert diff_documents(before, after) == {"medicalHistory": {"before": ["asthma", "diabetes"], "after": ["diabetes", "asthma"]}}
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from starlette.requests import Request
+
+from services.http_cache import is_not_modified, patient_validators
+
+PATIENT = {"_id": "p1", "lastModified": datetime(2024, 5, 1, 12, 30, 15, 250000), "riskRulesVersion": 2, "riskFingerprint": "abc"}
+
+
+def request(**headers):
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "headers": raw})
+
+
+def http_date(value):
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def test_matching_etag_is_not_modified():
+    etag = patient_validators(PATIENT)["ETag"]
+    assert is_not_modified(request(if_none_match=etag), etag)
+    assert is_not_modified(request(if_none_match=f'"other", W/{etag}'), etag)
+    assert is_not_modified(request(if_none_match="*"), etag)
+    assert not is_not_modified(request(if_none_match='"other"'), etag)
+
+
+def test_etag_changes_with_scores_as_well_as_edits():
+    etag = patient_validators(PATIENT)["ETag"]
+    assert patient_validators({**PATIENT, "riskFingerprint": "def"})["ETag"] != etag
+    assert patient_validators({**PATIENT, "lastModified": PATIENT["lastModified"] + timedelta(milliseconds=1)})["ETag"] != etag
+
+
+def test_if_modified_since_has_one_second_resolution():
+    last_modified = PATIENT["lastModified"]
+    etag = patient_validators(PATIENT)["ETag"]
+    same_second = last_modified.replace(microsecond=0)
+    assert is_not_modified(request(if_modified_since=http_date(same_second)), etag, last_modified)
+    assert not is_not_modified(request(if_modified_since=http_date(same_second - timedelta(seconds=1))), etag, last_modified)
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    last_modified = PATIENT["lastModified"]
+    etag = patient_validators(PATIENT)["ETag"]
+    later = http_date(last_modified + timedelta(days=1))
+    assert not is_not_modified(request(if_none_match='"other"', if_modified_since=later), etag, last_modified)
+
+
+def test_unparseable_or_missing_validators_are_modified():
+    etag = patient_validators(PATIENT)["ETag"]
+    assert not is_not_modified(request(if_modified_since="yesterday"), etag, PATIENT["lastModified"])
+    assert not is_not_modified(request(), etag, PATIENT["lastModified"])
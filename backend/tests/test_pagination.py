@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from services.pagination import build_list_query, encode_cursor, keyset_filter
+
+START = datetime(2024, 1, 1)
+
+
+def seed(db):
+    # Ties and nulls in the sort key, which keyset paging must step across.
+    documents = []
+    for i in range(12):
+        modified = None if i % 4 == 0 else START + timedelta(days=i % 3)
+        documents.append({"_id": ObjectId(), "name": f"Patient {i}", "lastModified": modified})
+    asyncio.run(db.patients.insert_many(documents))
+
+
+def read_all(db, sort_by, sort_dir, page_size):
+    async def pages():
+        ids, cursor = [], None
+        while True:
+            query, sort, collation = build_list_query(None, sort_by, sort_dir, cursor)
+            page = await db.patients.find(query, sort=sort, collation=collation, limit=page_size).to_list(page_size)
+            ids.extend(document["_id"] for document in page)
+            if len(page) < page_size:
+                return ids
+            cursor = encode_cursor(page[-1], sort[0][0])
+    return asyncio.run(pages())
+
+
+@pytest.mark.parametrize("sort_dir", ["asc", "desc"])
+@pytest.mark.parametrize("page_size", [1, 3, 5])
+def test_pages_cover_every_document_once_in_sort_order(db, sort_dir, page_size):
+    seed(db)
+    _, sort, _ = build_list_query(None, "lastModified", sort_dir, None)
+    expected = [document["_id"] for document in asyncio.run(db.patients.find({}, sort=sort).to_list(None))]
+
+    assert read_all(db, "lastModified", sort_dir, page_size) == expected
+
+
+def test_null_cursor_ascending_continues_into_non_null_values():
+    cursor = encode_cursor({"_id": ObjectId(), "lastModified": None}, "lastModified")
+    clauses = keyset_filter("lastModified", 1, cursor)["$or"]
+    assert {"lastModified": {"$ne": None}} in clauses
+
+
+def test_null_cursor_descending_stays_within_nulls():
+    cursor = encode_cursor({"_id": ObjectId(), "lastModified": None}, "lastModified")
+    clauses = keyset_filter("lastModified", -1, cursor)["$or"]
+    assert len(clauses) == 1 and clauses[0]["lastModified"] is None
+
+
+def test_value_cursor_descending_continues_into_nulls():
+    cursor = encode_cursor({"_id": ObjectId(), "lastModified": START}, "lastModified")
+    clauses = keyset_filter("lastModified", -1, cursor)["$or"]
+    assert {"lastModified": None} in clauses
+
+
+def test_risk_category_sorts_by_stored_severity():
+    _, sort, collation = build_list_query(None, "riskCategory", "desc", None)
+    assert sort == [("riskSeverity", -1), ("_id", -1)]
+    assert collation is None
+
+
+def test_name_sort_uses_case_insensitive_collation():
+    _, _, collation = build_list_query(None, "name", "asc", None)
+    assert collation["strength"] == 2
@@ -0,0 +1,143 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from bson import ObjectId
+
+import db as database
+from main import app
+from routes.patients import PATCH_ATTEMPTS
+from services.risk_assessment import score_patient
+
+PATIENT = {"name": "Pat Example", "dateOfBirth": "1990-01-01", "medicalHistory": ["hypertension"], "medications": ["lisinopril"]}
+
+
+def create_patient(client, **fields):
+    response = client.post("/api/v1/patients", json={**PATIENT, **fields})
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def stored(db, patient_id):
+    return asyncio.run(db.patients.find_one({"_id": ObjectId(patient_id)}))
+
+
+def assert_scores_match_inputs(document):
+    expected = score_patient(document)
+    for field in ["asaScore", "stopBangScore", "rcriScore", "metsScore", "riskCategory", "riskFingerprint", "riskSeverity"]:
+        assert document[field] == expected[field], field
+    assert sorted(document["criticalAlerts"]) == sorted(expected["criticalAlerts"])
+
+
+@pytest.mark.parametrize("field", ["name", "dateOfBirth", "medicalHistory", "medications", "allergies", "surgicalHistory", "completedRecommendations"])
+def test_null_is_rejected_before_writing(client, db, field):
+    patient_id = create_patient(client)
+    before = stored(db, patient_id)
+
+    response = client.patch(f"/api/v1/patients/{patient_id}", json={field: None})
+
+    assert response.status_code == 422
+    assert stored(db, patient_id) == before
+
+
+def test_score_input_change_stores_matching_scores(client, db):
+    patient_id = create_patient(client)
+
+    response = client.patch(f"/api/v1/patients/{patient_id}", json={"medicalHistory": ["chf"]})
+
+    assert response.status_code == 200
+    assert response.json()["riskCategory"] == "High"
+    document = stored(db, patient_id)
+    assert document["medicalHistory"] == ["chf"]
+    assert_scores_match_inputs(document)
+
+
+def test_notes_only_change_keeps_scores(client, db):
+    patient_id = create_patient(client)
+    before = stored(db, patient_id)
+
+    response = client.patch(f"/api/v1/patients/{patient_id}", json={"clinicianNotes": "Reviewed"})
+
+    assert response.status_code == 200
+    document = stored(db, patient_id)
+    assert document["clinicianNotes"] == "Reviewed"
+    assert document["riskFingerprint"] == before["riskFingerprint"]
+    assert document["lastModified"] > before["lastModified"]
+
+
+def test_unknown_patient_is_404(client):
+    assert client.patch(f"/api/v1/patients/{ObjectId()}", json={"medicalHistory": []}).status_code == 404
+    assert client.patch("/api/v1/patients/not-an-id", json={"medicalHistory": []}).status_code == 404
+
+
+class RacingCollection:
+    """Lands a competing notes-only write right after each of the first ``races`` reads."""
+
+    def __init__(self, collection, races):
+        self.collection = collection
+        self.races = races
+        self.reads = 0
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def find_one(self, *args, **kwargs):
+        document = await self.collection.find_one(*args, **kwargs)
+        self.reads += 1
+        if document is not None and self.reads <= self.races:
+            await self.collection.update_one(
+                {"_id": document["_id"]},
+                # A whole second later, since stored times only keep milliseconds.
+                {"$set": {"clinicianNotes": f"race {self.reads}", "lastModified": document["lastModified"] + timedelta(seconds=1)}},
+            )
+        return document
+
+
+class RacingDatabase:
+    def __init__(self, db, races):
+        self.db = db
+        self.patients = RacingCollection(db.patients, races)
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+    def __getitem__(self, name):
+        return self.db[name]
+
+
+def race(db, races):
+    racing = RacingDatabase(db, races)
+
+    async def get_racing_database():
+        return racing
+
+    app.dependency_overrides[database.get_database] = get_racing_database
+    return racing
+
+
+def test_lost_race_is_retried_with_a_fresh_read(client, db):
+    patient_id = create_patient(client)
+    racing = race(db, races=1)
+
+    response = client.patch(f"/api/v1/patients/{patient_id}", json={"medicalHistory": ["chf"]})
+
+    assert response.status_code == 200
+    assert racing.patients.reads == 2
+    document = stored(db, patient_id)
+    # The competing write survives and the inputs still match the scores.
+    assert document["clinicianNotes"] == "race 1"
+    assert document["medicalHistory"] == ["chf"]
+    assert_scores_match_inputs(document)
+
+
+def test_conflict_after_every_attempt_loses(client, db):
+    patient_id = create_patient(client)
+    racing = race(db, races=PATCH_ATTEMPTS)
+
+    response = client.patch(f"/api/v1/patients/{patient_id}", json={"medicalHistory": ["chf"]})
+
+    assert response.status_code == 409
+    assert racing.patients.reads == PATCH_ATTEMPTS
+    document = stored(db, patient_id)
+    assert document["medicalHistory"] == PATIENT["medicalHistory"]
+    assert_scores_match_inputs(document)
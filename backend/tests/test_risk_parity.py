@@ -0,0 +1,110 @@
+"""Randomized parity between the risk engines and the original rules.
+
+Run from the backend directory: python -m pytest tests
+"""
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from services.risk_assessment import CONDITIONS, RISK_METADATA_FIELDS, assess_risk, risk_memo, score_patient
+from services.risk_batch import ALERTS, AIRWAY_ALERT, DEFAULT_THRESHOLDS, RECOMMENDATIONS, RISK_CATEGORIES, build_feature_matrix, score_batch, score_matrix
+from services.synthetic import make_patient
+from tests import baseline_risk
+
+SEEDS = [0, 1, 2]
+PATIENTS_PER_SEED = 2000
+
+KEYWORDS = sorted({keyword for rules in CONDITIONS.values() for keywords in rules.values() for keyword in keywords})
+# Fragments that overlap keywords, differ in case, or could only match across
+# two list entries.
+NOISE = ["Family", "history of", "Poorly", "SLEEP", "apnea", "chronic", "mild", "Mi", "CVA", "osaka", " ", "\x00"]
+DATES_OF_BIRTH = [None, "", "not a date", "1990-05-05T00:00:00Z", "1950-01-01"]
+
+
+def _text(rng):
+    parts = [rng.choice(KEYWORDS + NOISE) for _ in range(rng.randint(0, 4))]
+    return rng.choice(["", " ", "-"]).join(part.upper() if rng.random() < 0.2 else part for part in parts)
+
+
+def _date_of_birth(rng):
+    if rng.random() < 0.3:
+        # Within a year either side of crossing the age threshold.
+        today = date.today()
+        return (date(today.year - 51, 1, 1) + timedelta(days=rng.randint(0, 3 * 366))).isoformat()
+    return rng.choice(DATES_OF_BIRTH)
+
+
+def _patient(rng):
+    if rng.random() < 0.05:
+        return {}
+    if rng.random() < 0.3:
+        return make_patient(rng)
+    patient = {field: [_text(rng) for _ in range(rng.randint(0, 5))] for field in ["medicalHistory", "medications", "allergies"]}
+    patient["surgicalHistory"] = rng.choice([[], ["Appendectomy"]])
+    patient["mallampatiScore"] = rng.choice([None, 0, 1, 2, 3, 4])
+    patient["dateOfBirth"] = _date_of_birth(rng)
+    return patient
+
+
+def _patients(seed):
+    rng = random.Random(seed)
+    return [_patient(rng) for _ in range(PATIENTS_PER_SEED)]
+
+
+def _canonical(result):
+    # Alerts and recommendations are unordered; metadata is not in the baseline.
+    return {
+        key: sorted(value) if isinstance(value, list) else value
+        for key, value in result.items()
+        if key not in RISK_METADATA_FIELDS
+    }
+
+
+@pytest.fixture(autouse=True)
+def empty_memo():
+    risk_memo.clear()
+    yield
+    risk_memo.clear()
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_assess_risk_matches_baseline(seed):
+    for patient in _patients(seed):
+        expected = _canonical(baseline_risk.assess_risk(patient))
+        assert _canonical(assess_risk(patient)) == expected, patient
+        # Second call is served from the memo.
+        assert _canonical(assess_risk(patient)) == expected, patient
+        assert _canonical(score_patient(patient)) == expected, patient
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_score_batch_matches_baseline(seed):
+    patients = _patients(seed)
+    for patient, result in zip(patients, score_batch(patients)):
+        assert _canonical(result) == _canonical(baseline_risk.assess_risk(patient)), patient
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_score_matrix_with_default_thresholds_matches_baseline(seed):
+    patients = _patients(seed)
+    columns = score_matrix(build_feature_matrix(patients), DEFAULT_THRESHOLDS)
+    for i, patient in enumerate(patients):
+        expected = baseline_risk.assess_risk(patient)
+        alerts = [name for bit, name in enumerate(ALERTS) if columns["criticalAlerts"][i] & (1 << bit)]
+        if columns["criticalAlerts"][i] & AIRWAY_ALERT:
+            alerts[alerts.index("Significant airway issue")] += f" (Mallampati Score {patient['mallampatiScore']})"
+        actual = {
+            "riskCategory": RISK_CATEGORIES[columns["riskCategory"][i]],
+            "criticalAlerts": sorted(alerts),
+            "preOpRecommendations": sorted(
+                name for bit, name in enumerate(RECOMMENDATIONS) if columns["preOpRecommendations"][i] & (1 << bit)
+            ),
+        }
+        if patient:
+            # Empty patients have no scores; their columns hold placeholders.
+            for field in ["asaScore", "stopBangScore", "rcriScore", "metsScore"]:
+                actual[field] = int(columns[field][i])
+        else:
+            expected = {key: expected[key] for key in actual}
+        assert actual == _canonical(expected), patient
@@ -0,0 +1,53 @@
+import asyncio
+import random
+from collections import Counter
+
+from bson import ObjectId
+
+from services.risk_assessment import score_patient
+from services.stats import compute_rollup, format_rollup, rollup_delta
+from services.synthetic import make_patient
+
+DROPPED = {"updatedAt", "reconciledAt"}
+
+
+def scored(patient):
+    return {**patient, **score_patient(patient)}
+
+
+def counters(document, pending=None):
+    return {key: value for key, value in format_rollup(document, pending).items() if key not in DROPPED}
+
+
+def test_summed_deltas_match_the_aggregated_rollup(db):
+    rng = random.Random(7)
+    stored = {}
+    deltas = Counter()
+
+    def write(patient_id, after):
+        deltas.update(rollup_delta(stored.get(patient_id), after))
+        if after is None:
+            del stored[patient_id]
+        else:
+            stored[patient_id] = after
+
+    for _ in range(300):
+        action = rng.random()
+        if action < 0.5 or not stored:
+            patient_id = ObjectId()
+            write(patient_id, {"_id": patient_id, **scored(make_patient(rng))})
+        elif action < 0.85:
+            patient_id = rng.choice(list(stored))
+            patient = dict(stored[patient_id])
+            patient.update(scored({**make_patient(rng), "name": patient["name"]}))
+            recommendations = patient["preOpRecommendations"]
+            patient["completedRecommendations"] = rng.sample(recommendations, rng.randint(0, len(recommendations)))
+            write(patient_id, patient)
+        else:
+            write(rng.choice(list(stored)), None)
+
+    if stored:
+        asyncio.run(db.patients.insert_many(list(stored.values())))
+    aggregated = asyncio.run(compute_rollup(db))
+
+    assert counters(aggregated) == counters({}, deltas)